@@ -0,0 +1,26 @@
+"""Add product content hash
+
+Revision ID: c7e1f4a9b302
+Revises: a2b5ed21d6af
+Create Date: 2026-10-19 10:12:44.512301
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e1f4a9b302'
+down_revision: Union[str, None] = 'a2b5ed21d6af'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('content_hash', sa.String(length=40), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'content_hash')
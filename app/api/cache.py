@@ -0,0 +1,106 @@
+# app/api/cache.py
+from typing import Callable, Coroutine, Any, Sequence
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from app.core.cache import CachedResponse, response_cache
+from app.core.config import settings
+from app.services.catalog import catalog_store
+
+
+def cache_response(max_age: int = None, vary_on: Sequence[Any] = ()):
+    """
+    Mark an endpoint as cacheable by CachedRoute
+
+    Args:
+        max_age: Optional Cache-Control max-age in seconds, defaults to
+            settings.RESPONSE_CACHE_MAX_AGE
+        vary_on: Other state the response depends on, besides the catalog
+            snapshot, added to the cache key and ETag. Each provides version(), the
+            version the next request will be served with, and
+            served_version(), the version of what is served right now
+
+    Returns:
+        Decorator that tags the endpoint and returns it unchanged
+    """
+    def decorator(func):
+        func.__response_cache__ = {
+            "max_age": settings.RESPONSE_CACHE_MAX_AGE if max_age is None else max_age,
+            "vary_on": tuple(vary_on)
+        }
+        return func
+    return decorator
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against an entity tag"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class CachedRoute(APIRoute):
+    """
+    API route that serves endpoints marked with @cache_response from the
+    response cache.
+
+    Conditional requests whose If-None-Match matches the current entity tag
+    of a cached response are answered with 304 before the endpoint runs, so
+    they never open a database query or touch the recommendation model.
+    Only successful responses are cached, so a request that fails
+    validation always reaches the endpoint and gets its 422.
+
+    Cache lookups use the versions the next request would be served with.
+    Since the endpoint itself may rebuild state (e.g. the catalog snapshot or
+    the popularity ranking), responses are stored and tagged with the versions that were
+    actually served, and not at all when those changed while it ran.
+    """
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        options = getattr(self.endpoint, "__response_cache__", None)
+        if options is None or not settings.RESPONSE_CACHE_ENABLED:
+            return handler
+
+        cache_control = f"public, max-age={options['max_age']}"
+        sources = (catalog_store, *options["vary_on"])
+
+        async def cached_handler(request: Request) -> Response:
+            if request.method != "GET":
+                return await handler(request)
+
+            path = request.url.path
+            params = request.query_params.multi_items()
+            key = response_cache.make_key(path, params, [source.version() for source in sources])
+            etag = response_cache.etag_for(key)
+            headers = {"ETag": etag, "Cache-Control": cache_control}
+
+            entry = response_cache.get(key)
+            if_none_match = request.headers.get("if-none-match")
+            if entry is not None and if_none_match and _etag_matches(if_none_match, etag):
+                response_cache.record_not_modified()
+                return Response(status_code=304, headers=headers)
+
+            if entry is None:
+                served = [source.served_version() for source in sources]
+                response = await handler(request)
+                if response.status_code != 200:
+                    return response
+                if [source.served_version() for source in sources] != served:
+                    # Rebuilt while the endpoint ran, so which version it
+                    # used is unknown: neither cache nor tag the response
+                    return response
+                key = response_cache.make_key(path, params, served)
+                headers["ETag"] = etag = response_cache.etag_for(key)
+                entry = CachedResponse(
+                    body=response.body,
+                    media_type=response.media_type,
+                    etag=etag
+                )
+                response_cache.set(key, entry)
+
+            return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+        return cached_handler
@@ -1,69 +1,106 @@
 # app/api/endpoints.py
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.db.base import get_db
-from app.schemas.product import ProductSearch, ProductInDB, ProductRecommendation
+from app.db.base import get_db, with_session
+from app.core.config import settings
+from app.api.cache import CachedRoute, cache_response
+from app.api.responses import product_rows_response, product_scores_response
+from app.api.streaming import iterate_lines
+from app.core.cache import response_cache
+from app.core.singleflight import SingleFlight
+from app.schemas.product import ProductSearch, ProductInDB, ProductRecommendation, ProductUpsertResult
 from app.schemas.customer import CustomerInDB
-from app.schemas.transaction import TransactionInDB
+from app.schemas.transaction import IngestResult, TransactionInDB
+from app.services.ingestion import transaction_ingestor
+from app.services.interactions import interaction_stats
+from app.services.popularity import popularity_service
+from app.services.product_upsert import ProductUpserter
 from app.services.recommendation import RecommendationService
 from app.services.search import SearchService
-from app.models.product import Product
+from app.models.product import Product, PRODUCT_RESPONSE_COLUMNS
 from app.models.customer import Customer
 from app.models.transaction import Transaction
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 # Initialize services
 recommendation_service = RecommendationService()
 search_service = SearchService()
+product_upserter = ProductUpserter(
+    recommendation_service,
+    chunk_size=settings.PRODUCT_UPSERT_CHUNK_SIZE,
+    max_errors=settings.INGEST_MAX_ERRORS
+)
+
+# Coalesce concurrent identical queries into one computation
+search_flight = SingleFlight("search")
+similar_flight = SingleFlight("recommendations_similar")
 
 @router.get("/search/", response_model=List[ProductInDB])
+@cache_response(vary_on=[popularity_service])
 async def search_products(
     query: str = Query(..., min_length=1),
     category: Optional[str] = None,
     brand: Optional[str] = None,
     min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    db: Session = Depends(get_db)
+    max_price: Optional[float] = None
 ):
     """
     Search for products with optional filters
     """
-    products = search_service.search_products(
-        db=db,
+    key = (query, category, brand, min_price, max_price)
+    products = await search_flight.do(
+        key,
+        run_in_threadpool,
+        with_session,
+        search_service.search_products,
         query=query,
         category=category,
         brand=brand,
         min_price=min_price,
         max_price=max_price
     )
-    return products
+    return product_rows_response(products)
 
 @router.get("/recommendations/similar/", response_model=List[ProductRecommendation])
+@cache_response()
 async def get_similar_products(
     query: str = Query(..., min_length=1),
     category: Optional[str] = None,
     brand: Optional[str] = None,
     min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    db: Session = Depends(get_db)
+    max_price: Optional[float] = None
 ):
     """
     Get product recommendations based on text similarity
     """
-    similar_products = recommendation_service.search_similar_products(
-        db=db,
+    key = (query, category, brand, min_price, max_price)
+    similar_products = await similar_flight.do(
+        key,
+        run_in_threadpool,
+        with_session,
+        recommendation_service.search_similar_products,
         query=query,
         category=category,
         brand=brand,
         min_price=min_price,
         max_price=max_price
     )
-    return [
-        ProductRecommendation(product=product, similarity_score=score)
-        for product, score in similar_products
-    ]
+    return product_scores_response(similar_products)
+
+@router.get("/recommendations/popular/", response_model=List[ProductInDB])
+async def get_popular_products(
+    category: Optional[str] = None,
+    limit: int = Query(settings.TOP_N_RECOMMENDATIONS, ge=1, le=settings.MAX_SEARCH_RESULTS),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the most popular products by time-decayed purchases
+    """
+    products = popularity_service.popular_products(db, limit=limit, category=category)
+    return product_rows_response(products)
 
 @router.get("/recommendations/collaborative/{customer_id}", response_model=List[ProductInDB])
 async def get_collaborative_recommendations(
@@ -81,7 +118,7 @@ async def get_collaborative_recommendations(
         db=db,
         customer_id=customer_id
     )
-    return recommendations
+    return product_rows_response(recommendations)
 
 @router.get("/products/", response_model=List[ProductInDB])
 async def get_all_products(
@@ -92,8 +129,23 @@ async def get_all_products(
     """
     Get all products with pagination
     """
-    products = db.query(Product).offset(skip).limit(limit).all()
-    return products
+    products = db.query(*PRODUCT_RESPONSE_COLUMNS).offset(skip).limit(limit).all()
+    return product_rows_response(products)
+
+@router.post("/products/bulk", response_model=ProductUpsertResult)
+async def upsert_products(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk-upsert products from an NDJSON body (one product per line; lines
+    with an id update that product)
+    """
+    return await run_in_threadpool(
+        product_upserter.upsert,
+        db=db,
+        lines=iterate_lines(request.stream())
+    )
 
 @router.get("/products/{product_id}", response_model=ProductInDB)
 async def get_product(
@@ -103,7 +155,7 @@ async def get_product(
     """
     Get a specific product by ID
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = db.query(*PRODUCT_RESPONSE_COLUMNS).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
@@ -132,6 +184,20 @@ async def get_all_transactions(
     transactions = db.query(Transaction).offset(skip).limit(limit).all()
     return transactions
 
+@router.post("/transactions/bulk", response_model=IngestResult)
+async def ingest_transactions(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk-ingest transactions from an NDJSON body (one transaction per line)
+    """
+    return await run_in_threadpool(
+        transaction_ingestor.ingest,
+        db=db,
+        lines=iterate_lines(request.stream())
+    )
+
 @router.get("/transactions/customer/{customer_id}", response_model=List[TransactionInDB])
 async def get_customer_transactions(
     customer_id: int,
@@ -147,4 +213,16 @@ async def get_customer_transactions(
     transactions = db.query(Transaction).filter(
         Transaction.customer_id == customer_id
     ).all()
-    return transactions
\ No newline at end of file
+    return transactions
+
+@router.get("/stats/")
+async def get_stats():
+    """
+    Get response cache, request coalescing, interaction and popularity counters
+    """
+    return {
+        "response_cache": response_cache.stats(),
+        "coalescing": [search_flight.stats(), similar_flight.stats()],
+        "interactions": interaction_stats.stats(),
+        "popularity": popularity_service.stats()
+    }
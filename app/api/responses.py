@@ -0,0 +1,41 @@
+# app/api/responses.py
+from typing import Iterable, List, Tuple, Any
+from fastapi.responses import ORJSONResponse
+from app.core.metrics import metrics
+
+
+def product_rows_response(rows: Iterable[Any]) -> ORJSONResponse:
+    """
+    Serialize trusted product rows straight to JSON
+
+    Rows are either SQLAlchemy rows of PRODUCT_RESPONSE_COLUMNS or catalog
+    ProductRow views, so they already have the ProductInDB shape and skip
+    Pydantic validation entirely. The route's response_model is still used
+    for the OpenAPI schema.
+
+    Args:
+        rows: Rows exposing _asdict()
+
+    Returns:
+        JSON response rendered with orjson
+    """
+    with metrics.span("serialize"):
+        return ORJSONResponse([row._asdict() for row in rows])
+
+
+def product_scores_response(scored_rows: Iterable[Tuple[Any, float]]) -> ORJSONResponse:
+    """
+    Serialize (row, score) pairs in the ProductRecommendation shape
+
+    Args:
+        scored_rows: Tuples of (product row, similarity score)
+
+    Returns:
+        JSON response rendered with orjson
+    """
+    with metrics.span("serialize"):
+        payload: List[dict] = [
+            {"product": row._asdict(), "similarity_score": float(score)}
+            for row, score in scored_rows
+        ]
+        return ORJSONResponse(payload)
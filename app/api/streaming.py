@@ -0,0 +1,35 @@
+# app/api/streaming.py
+from typing import AsyncIterator, Iterator, Optional
+
+import anyio.from_thread
+
+
+def iterate_lines(stream: AsyncIterator[bytes]) -> Iterator[bytes]:
+    """
+    Iterate the lines of an async byte stream from a worker thread
+
+    Lets synchronous code running under run_in_threadpool consume a request
+    body as it arrives: each read is scheduled back on the event loop.
+
+    Args:
+        stream: Async byte stream, e.g. Request.stream()
+
+    Returns:
+        Iterator of lines without their line terminators
+    """
+    async def next_chunk() -> Optional[bytes]:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    pending = b""
+    while True:
+        chunk = anyio.from_thread.run(next_chunk)
+        if chunk is None:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
@@ -0,0 +1,201 @@
+# app/core/cache.py
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+class CatalogVersion:
+    """
+    Monotonic counter identifying the current state of the product catalog.
+
+    The version is bumped whenever a session commits changes to products, so
+    anything derived from the catalog (cached responses, snapshots) can be
+    keyed on it. The epoch is random per process so that versions from a
+    previous run never collide with the current one; forked workers reseed
+    it so they never collide with each other either.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._epoch = uuid.uuid4().hex[:8]
+        self._counter = 0
+
+    @property
+    def value(self) -> str:
+        """Current catalog version as an opaque string"""
+        return f"{self._epoch}.{self._counter}"
+
+    def reseed(self) -> None:
+        """Start a new epoch, e.g. in a forked worker"""
+        with self._lock:
+            self._epoch = uuid.uuid4().hex[:8]
+
+    def bump(self) -> str:
+        """
+        Mark the catalog as changed
+
+        Returns:
+            The new catalog version
+        """
+        with self._lock:
+            self._counter += 1
+            return self.value
+
+
+catalog_version = CatalogVersion()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_product_changes(session: Session, flush_context) -> None:
+    """Remember that this session touched products so the commit can bump the version"""
+    from app.models.product import Product
+
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Product):
+            session.info["catalog_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_catalog_version(session: Session) -> None:
+    if session.info.pop("catalog_changed", False):
+        catalog_version.bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_product_changes(session: Session) -> None:
+    session.info.pop("catalog_changed", None)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A fully rendered response body together with its validators"""
+    body: bytes
+    media_type: str
+    etag: str
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of rendered responses.
+
+    Entries are keyed on the request path, the sorted query parameters,
+    the catalog version and any other versions the endpoint varies on, so
+    bumping the version implicitly invalidates
+    every entry without having to walk the cache.
+    """
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def normalize_params(params: Iterable[Tuple[str, str]]) -> Tuple[Tuple[str, str], ...]:
+        """
+        Order query parameters so requests differing only in order share a key
+
+        Values are kept exactly as received: stripping or dropping them could
+        map a request onto the cached response of one that validates or
+        filters differently.
+
+        Args:
+            params: Query string key/value pairs
+
+        Returns:
+            Sorted tuple of key/value pairs
+        """
+        return tuple(sorted(params))
+
+    def make_key(
+        self,
+        path: str,
+        params: Iterable[Tuple[str, str]],
+        versions: Iterable[str]
+    ) -> str:
+        """
+        Build the cache key for a request
+
+        Args:
+            path: Request path
+            params: Query string key/value pairs
+            versions: Versions of the state the response depends on, starting
+                with the catalog version
+
+        Returns:
+            Cache key string
+        """
+        return f"{'|'.join(versions)}|{path}?{urlencode(self.normalize_params(params))}"
+
+    @staticmethod
+    def etag_for(key: str) -> str:
+        """
+        Compute the entity tag for a cache key
+
+        The tag only depends on the key (which embeds the versions), so
+        conditional requests can be answered without rendering the body.
+        """
+        return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        size = len(entry.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+            self._entries[key] = entry
+            self._size += size
+            # Evict least recently used entries until we fit both bounds
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES
+)
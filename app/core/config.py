@@ -19,6 +19,8 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "product_recommendation"
     POSTGRES_PORT: str = "5432"
+    # Full database URL; overrides the POSTGRES_* settings when set
+    DATABASE_URL: Optional[str] = None
     
     # Recommendation system settings
     SIMILARITY_THRESHOLD: float = 0.3
@@ -43,12 +45,56 @@ class Settings(BaseSettings):
     MIN_SEARCH_CHARS: int = 3
     MAX_SEARCH_RESULTS: int = 50
     FUZZY_MATCH_THRESHOLD: float = 0.6
+
+    # Catalog snapshot settings
+    CATALOG_SNAPSHOT_TTL: int = 300
+    CATALOG_SNAPSHOT_BATCH_SIZE: int = 10000
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_STORE_DIR: str = "embedding_store"  # empty disables the on-disk cache
+    EMBEDDING_STORE_MAX_BYTES: int = 4 * 1024 ** 3  # compacted beyond this size
+
+    # Sharded scoring settings
+    SCORING_WORKERS: int = 0  # 0 uses one worker per CPU
+    SCORING_SHARD_SIZE: int = 50000  # rows per shard before scans are split
+
+    # Transaction ingestion settings
+    INGEST_CHUNK_SIZE: int = 5000
+    INGEST_MAX_ERRORS: int = 100  # errors reported per request
+    PRODUCT_UPSERT_CHUNK_SIZE: int = 2000
+    INTERACTION_HISTORY_WINDOW: int = 20  # recent purchases paired as co-purchases
+    INTERACTION_STATS_TTL: int = 0  # read transactions added by other processes every N seconds; 0 never
+
+    # Popularity settings
+    POPULARITY_HALF_LIFE_DAYS: float = 14.0  # age at which a purchase counts half
+    POPULARITY_REFRESH_SECONDS: int = 60  # max age of the precomputed ranking after ingests
+
+    # Metrics settings
+    METRICS_ENABLED: bool = True
+    METRICS_SAMPLE_RATE: float = 1.0
+
+    # On-demand profiling settings
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_INTERVAL: float = 0.005
+    PROFILING_RATE_LIMIT: int = 6  # profiled requests per minute
+    PROFILING_DIR: str = "profiles"
+    PROFILING_TRACEMALLOC_FRAMES: int = 10
+    PROFILING_TRACEMALLOC_TOP: int = 25
+
+    # Response cache settings
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_AGE: int = 60
     
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         """
         Constructs and returns the PostgreSQL database URI
         """
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
     class Config:
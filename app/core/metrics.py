@@ -0,0 +1,224 @@
+# app/core/metrics.py
+import bisect
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from app.core.config import settings
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+GaugeValue = Union[float, Dict[LabelKey, float]]
+
+# Whether the current request records per-stage timing spans
+_sampled: ContextVar[bool] = ContextVar("metrics_sampled", default=False)
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with one series per label set, rendered in
+    the Prometheus text format.
+    """
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series: Dict[LabelKey, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose value is read from a callback at scrape time. The callback
+    returns either a number or a mapping of label tuples to numbers.
+    """
+    def __init__(self, name: str, help: str, callback: Callable[[], GaugeValue]):
+        self.name = name
+        self.help = help
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.callback()
+        if isinstance(value, dict):
+            for key, item in sorted(value.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {item}")
+        elif value is not None:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class _NullSpan:
+    """Shared no-op context manager returned for unsampled requests"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("histogram", "stage", "start")
+
+    def __init__(self, histogram: Histogram, stage: str):
+        self.histogram = histogram
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Registry of request/stage histograms and callback gauges.
+
+    Request latencies are recorded for every request while metrics are
+    enabled. Stage spans are only recorded for sampled requests; for the
+    rest span() returns immediately after a single context variable lookup.
+    """
+    def __init__(self, enabled: bool, sample_rate: float):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.request_duration = Histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency by route, method and status"
+        )
+        self.stage_duration = Histogram(
+            "stage_duration_seconds",
+            "Hot-path stage latency by stage"
+        )
+        self._gauges: List[Gauge] = []
+
+    def gauge(self, name: str, help: str, callback: Callable[[], GaugeValue]) -> None:
+        """Register a gauge read from callback at scrape time"""
+        self._gauges.append(Gauge(name, help, callback))
+
+    def start_request(self) -> Optional[object]:
+        """
+        Decide whether the current request records stage spans
+
+        Returns:
+            Token to pass to end_request
+        """
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        return _sampled.set(sampled)
+
+    def end_request(self, token) -> None:
+        _sampled.reset(token)
+
+    def span(self, stage: str):
+        """
+        Time a named stage of the current request
+
+        Args:
+            stage: Stage name, e.g. "similar.encode"
+
+        Returns:
+            Context manager recording the stage duration when sampled
+        """
+        if not _sampled.get():
+            return _NULL_SPAN
+        return _Span(self.stage_duration, stage)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        lines.extend(self.request_duration.render())
+        lines.extend(self.stage_duration.render())
+        for gauge in self._gauges:
+            lines.extend(gauge.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(
+    enabled=settings.METRICS_ENABLED,
+    sample_rate=settings.METRICS_SAMPLE_RATE
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route and deciding
+    whether each request is sampled for stage spans.
+    """
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = self.registry.start_request()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.end_request(token)
+            route = scope.get("route")
+            self.registry.request_duration.observe(
+                time.perf_counter() - start,
+                route=getattr(route, "path", "unmatched"),
+                method=scope["method"],
+                status=str(status["code"])
+            )
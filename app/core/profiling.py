@@ -0,0 +1,208 @@
+# app/core/profiling.py
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Deque, List, Optional
+
+from app.core.config import settings
+
+# Modules whose frames at the top of a stack mean the thread is idle
+IDLE_MODULES = ("threading.py", "selectors.py", "queue.py")
+
+# Profile session of the current request, if it is being profiled
+_current_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler.
+
+    A background thread samples the stacks of all other threads every
+    `interval` seconds and aggregates them in the collapsed ("folded") format
+    understood by flamegraph.pl and speedscope. Idle threads are skipped.
+    Requests served concurrently with the profiled one show up too.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if frame.f_code.co_filename.endswith(IDLE_MODULES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        """Return the samples in collapsed-stack format"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class RateLimiter:
+    """Sliding-window limiter allowing `limit` events per `window` seconds"""
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._events: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._events and now - self._events[0] >= self.window:
+                self._events.popleft()
+            if len(self._events) >= self.limit:
+                return False
+            self._events.append(now)
+            return True
+
+
+class ProfileSession:
+    """State of one profiled request"""
+    def __init__(self, track_allocations: bool):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.track_allocations = track_allocations
+        self.allocation_reports: List[str] = []
+        self.profiler = SamplingProfiler(settings.PROFILING_INTERVAL)
+
+    def save(self, directory: str) -> str:
+        """
+        Write the profile (and allocation reports) to directory
+
+        Returns:
+            Path of the collapsed-stack profile
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.id}.folded")
+        with open(path, "w") as f:
+            f.write(self.profiler.folded())
+        if self.allocation_reports:
+            with open(os.path.join(directory, f"{self.id}.alloc.txt"), "w") as f:
+                f.write("\n\n".join(self.allocation_reports))
+        return path
+
+
+class track_allocations:
+    """
+    Record a tracemalloc diff around a block when the current request is
+    being profiled with allocation tracking. A no-op otherwise.
+
+    Args:
+        label: Name of the tracked block, e.g. "search.fuzzy_score"
+    """
+    def __init__(self, label: str):
+        self.label = label
+        self.session = None
+
+    def __enter__(self):
+        session = _current_session.get()
+        if session is None or not session.track_allocations:
+            return self
+        self.session = session
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+        self.before = tracemalloc.take_snapshot()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.session is None:
+            return False
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self.started:
+            tracemalloc.stop()
+        stats = after.compare_to(self.before, "lineno")[:settings.PROFILING_TRACEMALLOC_TOP]
+        lines = [f"# {self.label}: traced current={current} peak={peak} bytes"]
+        lines.extend(str(stat) for stat in stats)
+        self.session.allocation_reports.append("\n".join(lines))
+        return False
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling single requests on demand.
+
+    A request is profiled when PROFILING_ENABLED is set and it carries the
+    PROFILING_HEADER with the configured PROFILING_TOKEN. Adding
+    "allocations" to the header value (e.g. "<token>, allocations") also
+    records tracemalloc diffs for instrumented scans. At most one request is
+    profiled at a time, and at most PROFILING_RATE_LIMIT per minute; others
+    run normally with an X-Profile-Skipped header.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.PROFILING_HEADER.lower().encode("latin-1")
+        self.limiter = RateLimiter(settings.PROFILING_RATE_LIMIT, 60.0)
+        self._active = threading.Lock()
+
+    def _requested(self, scope) -> Optional[List[str]]:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return [part.strip() for part in value.decode("latin-1").split(",")]
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.PROFILING_ENABLED or not settings.PROFILING_TOKEN:
+            await self.app(scope, receive, send)
+            return
+
+        parts = self._requested(scope)
+        if not parts or not hmac.compare_digest(parts[0], settings.PROFILING_TOKEN):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.limiter.allow() or not self._active.acquire(blocking=False):
+            await self.app(scope, receive, send_with_headers(send, [(b"x-profile-skipped", b"rate-limited")]))
+            return
+
+        session = ProfileSession(track_allocations="allocations" in parts[1:])
+        token = _current_session.set(session)
+        session.profiler.start()
+        try:
+            await self.app(scope, receive, send_with_headers(send, [(b"x-profile-id", session.id.encode())]))
+        finally:
+            session.profiler.stop()
+            _current_session.reset(token)
+            self._active.release()
+            session.save(settings.PROFILING_DIR)
+
+
+def send_with_headers(send, headers):
+    """Wrap an ASGI send callable to append headers to the response start"""
+    async def wrapper(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": list(message.get("headers", [])) + headers}
+        await send(message)
+    return wrapper
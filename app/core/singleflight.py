@@ -0,0 +1,67 @@
+# app/core/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one shared computation.
+
+    The first caller for a key becomes the leader and runs the work; callers
+    that arrive with the same key while it is in flight await the leader's
+    result (or exception) instead of recomputing it. The work runs in its
+    own task, so it finishes for the followers even if the leader is
+    cancelled. It must therefore not use resources scoped to the leader's
+    request, such as its database session. Nothing is cached once it completes.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+
+    @property
+    def shared(self) -> int:
+        """Number of calls that were served by another caller's computation"""
+        return self.calls - self.executions
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Run func once per key among concurrent callers
+
+        Args:
+            key: Hashable identity of the computation
+            func: Coroutine function performing the work
+            *args, **kwargs: Arguments passed to func by the leader
+
+        Returns:
+            The result of the shared computation
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            # Run the work in its own task so a cancelled leader (e.g. a
+            # client that disconnected) does not fail the followers
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._inflight[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # shield so a cancelled caller does not cancel the shared work
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when nobody was waiting on it
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return coalescing counters"""
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared": self.shared,
+            "inflight": len(self._inflight),
+        }
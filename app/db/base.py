@@ -18,5 +18,14 @@ def get_db():
     db = SessionLocal()
     try:
         yield db
+    finally:
+        db.close()
+
+# Run func with a session of its own, for work that may outlive the request
+# that started it (e.g. a computation shared between coalesced requests)
+def with_session(func, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return func(*args, db=db, **kwargs)
     finally:
         db.close()
\ No newline at end of file
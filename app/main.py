@@ -1,9 +1,16 @@
 # app/main.py
+import time
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
-from app.api.endpoints import router as api_router
+from app.core.cache import response_cache
+from app.core.metrics import metrics, MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.api.endpoints import router as api_router, search_flight, similar_flight
 from app.db.base import Base, engine
+from app.services.catalog import catalog_store
+from app.services.interactions import interaction_stats
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -23,6 +30,12 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Record request latency per route and sample requests for stage timings
+app.add_middleware(MetricsMiddleware)
+
+# Profile single requests on demand (opt-in, token-gated, rate-limited)
+app.add_middleware(ProfilingMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -36,4 +49,50 @@ async def root():
         "version": settings.VERSION,
         "docs_url": "/docs",
         "redoc_url": "/redoc"
-    }
\ No newline at end of file
+    }
+
+def _pool_stats():
+    pool = engine.pool
+    stats = {}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[(("state", name),)] = getattr(pool, name)()
+    return stats
+
+def _snapshot_stats():
+    snapshot = catalog_store.snapshot
+    if snapshot is None:
+        return {}
+    return {
+        (("field", "products"),): snapshot.size,
+        (("field", "age_seconds"),): round(time.monotonic() - snapshot.built_at, 3),
+    }
+
+metrics.gauge(
+    "response_cache",
+    "Response cache entries, bytes and hit counters",
+    lambda: {(("field", k),): v for k, v in response_cache.stats().items()}
+)
+metrics.gauge(
+    "singleflight",
+    "Request coalescing counters",
+    lambda: {
+        (("flight", flight.name), ("field", k)): v
+        for flight in (search_flight, similar_flight)
+        for k, v in flight.stats().items() if k != "name"
+    }
+)
+metrics.gauge("db_pool", "Database connection pool state", _pool_stats)
+metrics.gauge("catalog_snapshot", "Catalog snapshot size and age", _snapshot_stats)
+metrics.gauge(
+    "interaction_stats",
+    "Transactions and products tracked by the incremental interaction statistics",
+    lambda: {(("field", k),): v for k, v in interaction_stats.stats().items()}
+)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus metrics endpoint
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
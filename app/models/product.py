@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ARRAY, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ARRAY, Text, JSON
+from sqlalchemy.orm import relationship, deferred
 from app.db.base import Base
 
 class Product(Base):
@@ -12,15 +12,37 @@ class Product(Base):
     name = Column(String, index=True)
     category = Column(String, index=True)
     short_description = Column(String)
-    description = Column(Text)
+    # Heavy columns are deferred; queries load them explicitly when needed
+    description = deferred(Column(Text))
     brand = Column(String, index=True)
     color = Column(String)
     price = Column(Float)
     currency = Column(String, default="USD")
-    tags = Column(ARRAY(String))
+    # Arrays are stored as JSON on SQLite (used for local benchmarks)
+    tags = Column(ARRAY(String).with_variant(JSON(), "sqlite"))
     
     # Vector representation for similarity search (stored as array of floats)
-    embedding = Column(ARRAY(Float))
+    embedding = deferred(Column(ARRAY(Float).with_variant(JSON(none_as_null=True), "sqlite")))
+    # SHA-1 of the text the embedding was computed from (see
+    # RecommendationService.product_text); NULL when it is unknown
+    content_hash = deferred(Column(String(40)))
 
     # Relationships
     transactions = relationship("Transaction", back_populates="product")
+
+
+# Columns returned by the API (ProductInDB), in schema order. Selecting these
+# directly yields lightweight rows instead of hydrated Product instances and
+# never pulls the embedding array over the wire.
+PRODUCT_RESPONSE_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.category,
+    Product.short_description,
+    Product.description,
+    Product.brand,
+    Product.color,
+    Product.price,
+    Product.currency,
+    Product.tags,
+)
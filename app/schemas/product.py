@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
+from app.schemas.transaction import IngestError
 
 class ProductBase(BaseModel):
     name: str
@@ -15,6 +16,17 @@ class ProductBase(BaseModel):
 class ProductCreate(ProductBase):
     pass
 
+class ProductUpsert(ProductBase):
+    id: Optional[int] = None
+
+class ProductUpsertResult(BaseModel):
+    received: int
+    created: int
+    updated: int
+    encoded: int
+    rejected: int
+    errors: List[IngestError]
+
 class ProductInDB(ProductBase):
     id: int
 
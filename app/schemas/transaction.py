@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class TransactionBase(BaseModel):
     product_id: int
@@ -18,4 +18,16 @@ class TransactionInDB(TransactionBase):
     purchase_date: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class TransactionIngest(TransactionBase):
+    purchase_date: Optional[datetime] = None
+
+class IngestError(BaseModel):
+    line: int
+    error: str
+
+class IngestResult(BaseModel):
+    received: int
+    inserted: int
+    rejected: int
+    errors: List[IngestError]
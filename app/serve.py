@@ -0,0 +1,186 @@
+# app/serve.py
+"""
+Prefork server sharing the model and catalog across worker processes.
+
+The master process imports the app (loading the SentenceTransformer once),
+builds the catalog snapshot and product embedding matrix, then forks the
+workers. Model weights and the snapshot's NumPy arrays are only read after
+the fork, so their pages stay shared copy-on-write instead of being
+duplicated per worker. gc.freeze() keeps the garbage collector from touching
+(and thereby copying) the objects created before the fork.
+
+Usage:
+    python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+logger = logging.getLogger("app.serve")
+
+# Refresh interval used when several workers would otherwise never refresh
+SHARED_STATE_TTL = 60
+
+
+def warm_up() -> None:
+    """Load the catalog snapshot, embedding matrix and popularity ranking in the master"""
+    from app.api.endpoints import recommendation_service
+    from app.db.base import SessionLocal, engine
+    from app.services.catalog import catalog_store
+    from app.services.popularity import popularity_service
+
+    db = SessionLocal()
+    try:
+        snapshot = catalog_store.get(db)
+        snapshot.lowercase_columns()
+        recommendation_service.get_product_embeddings(snapshot, db)
+        popularity_service.ranking(db, snapshot)
+        logger.info("Warmed catalog snapshot with %d products", snapshot.size)
+    finally:
+        db.close()
+    # Connections must not be shared with the forked workers
+    engine.dispose()
+
+
+def limit_inference_threads(workers: int) -> None:
+    """Split the cores between workers so inference and scoring do not oversubscribe"""
+    from app.core.config import settings
+    from app.services.sharding import sharded_scorer
+
+    share = max(1, (os.cpu_count() or 1) // workers)
+    if not settings.SCORING_WORKERS:
+        sharded_scorer.workers = share
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(share)
+
+
+def require_reloads(workers: int) -> None:
+    """
+    Make sure workers periodically refresh the catalog and interaction stats
+
+    Each worker keeps its own snapshot, stats and response cache, and only
+    sees writes made through other workers when it refreshes them. The stats
+    only read transactions added since, so a short interval stays cheap.
+    """
+    if workers < 2:
+        return
+    from app.services.catalog import catalog_store
+    from app.services.interactions import interaction_stats
+
+    for name, store in (("CATALOG_SNAPSHOT_TTL", catalog_store), ("INTERACTION_STATS_TTL", interaction_stats)):
+        if not store.ttl:
+            logger.warning("%s=0 would hide other workers' writes; using %d seconds", name, SHARED_STATE_TTL)
+            store.ttl = SHARED_STATE_TTL
+
+
+def reseed_catalog_version() -> None:
+    """Give a forked worker its own version epoch, keeping the warmed snapshot current"""
+    from app.core.cache import catalog_version
+    from app.services.catalog import catalog_store
+
+    previous = catalog_version.value
+    catalog_version.reseed()
+    snapshot = catalog_store.snapshot
+    if snapshot is not None and snapshot.version == previous:
+        snapshot.version = catalog_version.value
+
+
+def run_worker(app, sock: socket.socket, workers: int, log_level: str) -> None:
+    # Versions (and ETags) must not repeat across workers with different state
+    reseed_catalog_version()
+    limit_inference_threads(workers)
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefork server sharing the model and catalog")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-warm-up", action="store_true",
+                        help="Skip building the catalog snapshot before forking")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    from app.main import app
+
+    require_reloads(args.workers)
+    if not args.no_warm_up:
+        warm_up()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Move everything allocated so far out of the GC's reach so collections
+    # in the workers do not write to (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                run_worker(app, sock, args.workers, args.log_level)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    logger.info("Serving on http://%s:%d with %d workers", args.host, args.port, args.workers)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning("Worker %d exited with status %d, restarting", pid, status)
+        # Avoid a tight respawn loop when workers crash on start
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        spawn()
+
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
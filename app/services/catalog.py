@@ -0,0 +1,347 @@
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.cache import catalog_version
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.product import Product, PRODUCT_RESPONSE_COLUMNS
+
+# Field names of a product row, in ProductInDB order
+PRODUCT_FIELDS = tuple(column.key for column in PRODUCT_RESPONSE_COLUMNS)
+
+
+class ProductRow:
+    """
+    Lightweight read-only view of one catalog product.
+
+    Only created for rows that are actually returned; exposes the same
+    attribute names and _asdict() as a SQLAlchemy Row.
+    """
+    __slots__ = PRODUCT_FIELDS
+
+    def __init__(self, **values):
+        for field in PRODUCT_FIELDS:
+            setattr(self, field, values[field])
+
+    def _asdict(self) -> Dict[str, object]:
+        return {field: getattr(self, field) for field in PRODUCT_FIELDS}
+
+    def __repr__(self) -> str:
+        return f"ProductRow(id={self.id!r}, name={self.name!r})"
+
+
+class DictionaryColumn:
+    """
+    Dictionary-encoded categorical column: one small int code per row plus
+    the list of distinct values. Missing values are encoded as -1.
+    """
+    __slots__ = ("codes", "values", "lookup")
+
+    def __init__(self, codes: np.ndarray, values: List[str]):
+        self.codes = codes
+        self.values = values
+        self.lookup = {value: code for code, value in enumerate(values)}
+
+    @classmethod
+    def encode(cls, raw: Iterable[Optional[str]]) -> "DictionaryColumn":
+        lookup: Dict[str, int] = {}
+        codes = []
+        for value in raw:
+            if value is None:
+                codes.append(-1)
+            else:
+                codes.append(lookup.setdefault(value, len(lookup)))
+        dtype = np.int16 if len(lookup) < np.iinfo(np.int16).max else np.int32
+        return cls(np.asarray(codes, dtype=dtype), list(lookup))
+
+    def code_of(self, value: str) -> int:
+        """Return the code for value, or -1 when it does not occur"""
+        return self.lookup.get(value, -1)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        code = self.codes[index]
+        return None if code < 0 else self.values[code]
+
+
+class LowercaseColumns:
+    """
+    Lowercased text columns of a snapshot, used for fuzzy matching.
+
+    Names and short descriptions are dictionary-encoded after lowercasing,
+    so a string shared by many products is only compared once. Brands and
+    tags reuse the snapshot's codes with lowercased values.
+    """
+    __slots__ = ("name", "short_description", "brand", "tag_values")
+
+    def __init__(self, snapshot: "CatalogSnapshot"):
+        self.name = DictionaryColumn.encode(
+            None if v is None else v.lower() for v in snapshot.names
+        )
+        self.short_description = DictionaryColumn.encode(
+            None if v is None else v.lower() for v in snapshot.short_descriptions
+        )
+        self.brand = DictionaryColumn(snapshot.brand.codes, [v.lower() for v in snapshot.brand.values])
+        self.tag_values = [v.lower() for v in snapshot.tag_values]
+
+
+class CatalogSnapshot:
+    """
+    Read-only columnar snapshot of the product catalog.
+
+    Products are ordered by id. Numeric fields live in NumPy arrays,
+    categorical fields are dictionary-encoded and tags are stored in CSR form
+    (tag_indptr/tag_codes into tag_values), so services can filter and score
+    without hydrating ORM instances.
+    """
+    def __init__(self, rows: Sequence, version: str):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.size = len(rows)
+
+        self.ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=self.size)
+        self.price = np.fromiter(
+            (np.nan if r.price is None else r.price for r in rows),
+            dtype=np.float64,
+            count=self.size
+        )
+        self.names = [r.name for r in rows]
+        self.short_descriptions = [r.short_description for r in rows]
+        self.descriptions = [r.description for r in rows]
+        self.category = DictionaryColumn.encode(r.category for r in rows)
+        self.brand = DictionaryColumn.encode(r.brand for r in rows)
+        self.color = DictionaryColumn.encode(r.color for r in rows)
+        self.currency = DictionaryColumn.encode(r.currency for r in rows)
+
+        # CSR-encoded tags
+        tag_lookup: Dict[str, int] = {}
+        indptr = np.zeros(self.size + 1, dtype=np.int64)
+        codes = []
+        for i, r in enumerate(rows):
+            tags = r.tags or []
+            codes.extend(tag_lookup.setdefault(tag, len(tag_lookup)) for tag in tags)
+            indptr[i + 1] = indptr[i] + len(tags)
+        self.tag_indptr = indptr
+        self.tag_codes = np.asarray(codes, dtype=np.int32)
+        self.tag_values = list(tag_lookup)
+        self.tag_lookup = tag_lookup
+        # Row position of every entry in tag_codes
+        self.tag_rows = np.repeat(np.arange(self.size, dtype=np.int64), np.diff(indptr))
+
+        self.fingerprint = self._fingerprint()
+        self._lowercase: Optional[LowercaseColumns] = None
+        self._lowercase_lock = threading.Lock()
+
+    def _fingerprint(self) -> str:
+        """Digest of the catalog contents, used to detect external changes"""
+        digest = hashlib.sha1()
+        digest.update(self.ids.tobytes())
+        digest.update(self.price.tobytes())
+        digest.update(self.tag_indptr.tobytes())
+        digest.update(self.tag_codes.tobytes())
+        for column in (self.names, self.short_descriptions, self.descriptions, self.tag_values):
+            digest.update("\x1f".join(str(v) for v in column).encode("utf-8"))
+        # Codes alone miss a renamed value, so hash every dictionary too
+        for column in (self.category, self.brand, self.color, self.currency):
+            digest.update("\x1f".join(column.values).encode("utf-8"))
+            digest.update(column.codes.tobytes())
+        return digest.hexdigest()
+
+    def lowercase_columns(self) -> LowercaseColumns:
+        """Lowercased text columns, built on first use"""
+        if self._lowercase is None:
+            with self._lowercase_lock:
+                if self._lowercase is None:
+                    self._lowercase = LowercaseColumns(self)
+        return self._lowercase
+
+    def tag_entries(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gather the CSR tag entries of several rows
+
+        Args:
+            indices: Row positions
+
+        Returns:
+            Tuple of (tag codes of all rows concatenated, tag count per row)
+        """
+        starts = self.tag_indptr[indices]
+        counts = self.tag_indptr[np.asarray(indices) + 1] - starts
+        offsets = np.cumsum(counts) - counts
+        entries = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+        return self.tag_codes[entries], counts
+
+    def tags_of(self, index: int) -> List[str]:
+        """Return the tags of the product at index"""
+        start, end = self.tag_indptr[index], self.tag_indptr[index + 1]
+        return [self.tag_values[code] for code in self.tag_codes[start:end]]
+
+    def positions_of(self, product_ids: Iterable[int]) -> np.ndarray:
+        """
+        Map product IDs to row positions, dropping unknown IDs
+
+        Args:
+            product_ids: Product IDs
+
+        Returns:
+            Array of row positions
+        """
+        ids = np.fromiter(product_ids, dtype=np.int64)
+        if not len(ids) or not self.size:
+            return np.empty(0, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, ids), self.size - 1)
+        return np.unique(positions[self.ids[positions] == ids])
+
+    def filter_indices(
+        self,
+        category: str = None,
+        brand: str = None,
+        min_price: float = None,
+        max_price: float = None
+    ) -> np.ndarray:
+        """
+        Row positions matching the optional filters, in id order
+
+        Args:
+            category: Optional category filter
+            brand: Optional brand filter
+            min_price: Optional minimum price filter
+            max_price: Optional maximum price filter
+
+        Returns:
+            Array of row positions
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for column, value in ((self.category, category), (self.brand, brand)):
+            if value:
+                # An unknown value matches nothing (code -1 marks missing values)
+                code = column.code_of(value)
+                mask &= (column.codes == code) if code >= 0 else False
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_price is not None:
+            mask &= self.price <= max_price
+        return np.flatnonzero(mask)
+
+    def row(self, index: int) -> ProductRow:
+        """Materialize the product at index"""
+        price = self.price[index]
+        return ProductRow(
+            id=int(self.ids[index]),
+            name=self.names[index],
+            category=self.category[index],
+            short_description=self.short_descriptions[index],
+            description=self.descriptions[index],
+            brand=self.brand[index],
+            color=self.color[index],
+            price=None if np.isnan(price) else float(price),
+            currency=self.currency[index],
+            tags=self.tags_of(index),
+        )
+
+    def rows(self, indices: Iterable[int]) -> List[ProductRow]:
+        """Materialize the products at the given positions, in order"""
+        return [self.row(i) for i in indices]
+
+
+class CatalogStore:
+    """
+    Holds the current CatalogSnapshot and rebuilds it when the catalog
+    version changes or the snapshot is older than CATALOG_SNAPSHOT_TTL.
+
+    A rebuild that finds the same contents keeps the existing snapshot; a TTL
+    rebuild that finds different contents (e.g. products written by another
+    process) bumps the catalog version so derived caches drop too. While one
+    thread rebuilds, others keep getting the current snapshot; they only
+    wait when there is none yet.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, snapshot: Optional[CatalogSnapshot]) -> bool:
+        if snapshot is None or snapshot.version != catalog_version.value:
+            return False
+        return not self.ttl or time.monotonic() - snapshot.built_at < self.ttl
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        """
+        Return a current snapshot, rebuilding it from the database if needed
+
+        Args:
+            db: Database session used for a rebuild
+
+        Returns:
+            The current CatalogSnapshot
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        if not self._lock.acquire(blocking=snapshot is None):
+            # Another thread is rebuilding; serve the current snapshot meanwhile
+            return snapshot
+        try:
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                return snapshot
+            version = catalog_version.value
+            rebuilt = self.build(db, version)
+            if snapshot is not None and snapshot.fingerprint == rebuilt.fingerprint:
+                # Unchanged contents: keep the existing snapshot so anything
+                # derived from it (embedding matrix, pages shared with a
+                # prefork master) stays valid
+                snapshot.version = version
+                snapshot.built_at = rebuilt.built_at
+                return snapshot
+            if snapshot is not None and snapshot.version == version:
+                rebuilt.version = catalog_version.bump()
+            self._snapshot = rebuilt
+            return rebuilt
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def build(db: Session, version: str) -> CatalogSnapshot:
+        """Load the catalog columns and build a snapshot"""
+        with metrics.span("catalog.db_fetch"):
+            rows = (
+                db.query(*PRODUCT_RESPONSE_COLUMNS)
+                .order_by(Product.id)
+                .yield_per(settings.CATALOG_SNAPSHOT_BATCH_SIZE)
+                .all()
+            )
+        with metrics.span("catalog.build"):
+            return CatalogSnapshot(rows, version)
+
+    def version(self) -> str:
+        """
+        Identify the snapshot the next request will be served with
+
+        Used as a response cache key component: once the snapshot is due for
+        a rebuild, this no longer matches the version it serves.
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot.version
+        return f"{catalog_version.value}+"
+
+    def served_version(self) -> str:
+        """Identify the snapshot requests are served with right now"""
+        snapshot = self._snapshot
+        return "" if snapshot is None else snapshot.version
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """The current snapshot, without triggering a rebuild"""
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+
+catalog_store = CatalogStore(ttl=settings.CATALOG_SNAPSHOT_TTL)
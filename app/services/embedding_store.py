@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+KEY_SIZE = 20  # SHA-1 digest
+
+
+class EmbeddingStore:
+    """
+    Persistent embedding cache keyed on the model name and preprocessed text.
+
+    Entries live in one append-only file of fixed-size records (20-byte
+    SHA-1 key followed by the float32 vector), memory-mapped for reads. The
+    in-memory index maps keys to records and is extended from the file tail
+    when other processes append. When the file grows past max_bytes it is
+    compacted: duplicates are dropped and only the newest entries filling
+    half the bound are kept, written to a new file that atomically replaces
+    the old one. Appends and compaction take an exclusive lock on a sidecar
+    lock file where fcntl is available.
+    """
+    def __init__(self, directory: str, model_name: str, dimension: int, max_bytes: int):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_bytes = max_bytes
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.path = os.path.join(directory, f"{slug}-{dimension}.embeddings")
+        self.lock_path = self.path + ".lock"
+        self.dtype = np.dtype([("key", f"V{KEY_SIZE}"), ("vector", "<f4", (dimension,))])
+        self._index: Dict[bytes, int] = {}
+        self._map: Optional[np.memmap] = None
+        self._count = 0
+        self._inode: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, text: str) -> bytes:
+        """Key of a preprocessed text for this store's model"""
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """Pick up records appended (or a file compacted) by other processes"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._index, self._map, self._count, self._inode = {}, None, 0, None
+            return
+        if stat.st_ino != self._inode:
+            self._index, self._map, self._count, self._inode = {}, None, 0, stat.st_ino
+        # A partially written trailing record is ignored
+        count = stat.st_size // self.dtype.itemsize
+        if count <= self._count:
+            return
+        self._map = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(count,))
+        for row, key in enumerate(self._map["key"][self._count:count].tolist(), start=self._count):
+            # Later records win, so a re-appended key maps to its newest vector
+            self._index[bytes(key)] = row
+        self._count = count
+
+    def get(self, keys: Sequence[bytes]) -> Tuple[List[int], np.ndarray]:
+        """
+        Look up vectors
+
+        Args:
+            keys: Keys from key()
+
+        Returns:
+            Tuple of (positions in keys that were found, their vectors)
+        """
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._sync()
+            found, rows = [], []
+            for position, key in enumerate(keys):
+                row = self._index.get(key)
+                if row is not None:
+                    found.append(position)
+                    rows.append(row)
+            if not rows:
+                return [], np.empty((0, self.dimension), dtype=np.float32)
+            return found, np.asarray(self._map["vector"][rows], dtype=np.float32)
+
+    def put(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        """
+        Append vectors for keys that are not stored yet
+
+        Args:
+            keys: Keys from key()
+            vectors: Float32 matrix, one row per key
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            self._sync()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index:
+                    new[key] = vector
+            if not new:
+                return
+            records = np.empty(len(new), dtype=self.dtype)
+            records["key"] = np.frombuffer(b"".join(new), dtype=f"V{KEY_SIZE}")
+            records["vector"] = np.asarray(list(new.values()), dtype=np.float32)
+            with open(self.path, "ab") as f:
+                # Drop a partial record left by an interrupted append
+                f.truncate(self._count * self.dtype.itemsize)
+                f.write(records.tobytes())
+            self._sync()
+            if self._count * self.dtype.itemsize > self.max_bytes:
+                self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the newest unique records, up to half of max_bytes"""
+        keep = max(1, self.max_bytes // 2 // self.dtype.itemsize)
+        rows = np.sort(np.fromiter(self._index.values(), dtype=np.int64))[-keep:]
+        temporary = self.path + ".compact"
+        with open(temporary, "wb") as f:
+            f.write(np.ascontiguousarray(self._map[rows]).tobytes())
+        os.replace(temporary, self.path)
+        self._sync()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._index),
+            "records": self._count,
+            "bytes": self._count * self.dtype.itemsize,
+        }
@@ -0,0 +1,211 @@
+import io
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.customer import Customer
+from app.models.product import Product
+from app.models.transaction import Transaction
+from app.schemas.transaction import TransactionIngest
+from app.services.interactions import InteractionStats, interaction_stats
+
+# Columns written for each ingested transaction, in COPY order
+TRANSACTION_COLUMNS = (
+    "product_id", "customer_id", "amount_paid", "purchase_date",
+    "is_returned", "rating", "review_text",
+)
+
+# (line number, row) pairs of one chunk
+Chunk = List[Tuple[int, Dict]]
+
+
+class IngestReport:
+    """Counters and the first errors of one ingestion request"""
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.received = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.errors: List[Dict] = []
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> Dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+        }
+
+
+def _naive_utc(value):
+    """Convert an aware datetime to naive UTC, the form the database columns store"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def validate_lines(
+    lines: Iterable[bytes],
+    adapter: TypeAdapter,
+    chunk_size: int,
+    report: IngestReport
+) -> Iterator[Chunk]:
+    """
+    Parse and validate NDJSON lines, yielding chunks of valid rows
+
+    Args:
+        lines: NDJSON lines
+        adapter: Type adapter of the line schema
+        chunk_size: Rows per chunk
+        report: Report receiving counts and rejected lines
+
+    Returns:
+        Iterator of chunks of (line number, row dict), with datetimes in naive UTC
+    """
+    chunk: Chunk = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        report.received += 1
+        try:
+            item = adapter.validate_json(line)
+        except ValidationError as exc:
+            error = exc.errors(include_url=False)[0]
+            location = ".".join(str(part) for part in error["loc"])
+            report.reject(number, f"{location}: {error['msg']}" if location else error["msg"])
+            continue
+        row = {key: _naive_utc(value) for key, value in item.model_dump().items()}
+        chunk.append((number, row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_value(value) -> str:
+    """Format a value for PostgreSQL COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return (value.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+    return repr(value)
+
+
+class TransactionIngestor:
+    """
+    Bulk-ingests transactions from NDJSON lines.
+
+    Lines flow through a chain of generators, one chunk at a time: parse and
+    validate, check that the referenced products and customers exist, write
+    the chunk with a multi-row insert (COPY on PostgreSQL), then commit it
+    and apply it to the interaction statistics. Invalid lines are rejected
+    individually; valid lines are ingested regardless.
+    """
+    def __init__(self, stats: InteractionStats, chunk_size: int, max_errors: int):
+        self.stats = stats
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.adapter = TypeAdapter(TransactionIngest)
+
+    def validate(self, lines: Iterable[bytes], report: IngestReport) -> Iterator[Chunk]:
+        """Parse and validate lines, yielding chunks of valid rows"""
+        return validate_lines(lines, self.adapter, self.chunk_size, report)
+
+    def check_references(self, db: Session, chunks: Iterable[Chunk], report: IngestReport) -> Iterator[Chunk]:
+        """Drop rows referencing unknown products or customers"""
+        for chunk in chunks:
+            product_ids = {row["product_id"] for _, row in chunk}
+            customer_ids = {row["customer_id"] for _, row in chunk}
+            known_products = {i for (i,) in db.query(Product.id).filter(Product.id.in_(product_ids))}
+            known_customers = {i for (i,) in db.query(Customer.id).filter(Customer.id.in_(customer_ids))}
+
+            valid: Chunk = []
+            for number, row in chunk:
+                if row["product_id"] not in known_products:
+                    report.reject(number, f"product_id: unknown product {row['product_id']}")
+                elif row["customer_id"] not in known_customers:
+                    report.reject(number, f"customer_id: unknown customer {row['customer_id']}")
+                else:
+                    valid.append((number, row))
+            if valid:
+                yield valid
+
+    def write(self, db: Session, chunks: Iterable[Chunk]) -> Iterator[List[Dict]]:
+        """Insert each chunk, yielding the written rows"""
+        for chunk in chunks:
+            now = datetime.utcnow()
+            rows = [
+                {**row, "purchase_date": row["purchase_date"] or now}
+                for _, row in chunk
+            ]
+            with metrics.span("ingest.write"):
+                if db.get_bind().dialect.name == "postgresql":
+                    self._copy(db, rows)
+                else:
+                    db.execute(insert(Transaction.__table__), rows)
+            yield rows
+
+    @staticmethod
+    def _copy(db: Session, rows: List[Dict]) -> None:
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(row[column]) for column in TRANSACTION_COLUMNS))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {Transaction.__tablename__} ({', '.join(TRANSACTION_COLUMNS)}) FROM STDIN",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+    def ingest(self, db: Session, lines: Iterable[bytes]) -> Dict:
+        """
+        Ingest NDJSON transaction lines
+
+        Each chunk is committed separately, so rows of earlier chunks stay
+        ingested if a later chunk fails.
+
+        Args:
+            db: Database session
+            lines: NDJSON lines, one transaction per line
+
+        Returns:
+            Received, inserted and rejected counts and the first errors
+        """
+        report = IngestReport(self.max_errors)
+        self.stats.ensure_loaded(db)
+
+        chunks = self.validate(lines, report)
+        chunks = self.check_references(db, chunks, report)
+        for rows in self.write(db, chunks):
+            with metrics.span("ingest.commit"):
+                self.stats.record(db, commit=db.commit)
+            report.inserted += len(rows)
+        return report.as_dict()
+
+
+transaction_ingestor = TransactionIngestor(
+    stats=interaction_stats,
+    chunk_size=settings.INGEST_CHUNK_SIZE,
+    max_errors=settings.INGEST_MAX_ERRORS
+)
@@ -0,0 +1,297 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.transaction import Transaction
+
+# Decayed counters are rebased before exp() of their exponent can overflow
+REBASE_EXPONENT = 500.0
+
+# Ids skipped by a catch-up may belong to transactions still being committed;
+# they are looked for again for this many seconds, keeping the highest ones
+GAP_TIMEOUT = 300.0
+MAX_GAPS = 10000
+
+
+def _seconds(moment: datetime) -> float:
+    """Seconds since the epoch of a naive UTC or an aware datetime"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - datetime(1970, 1, 1)).total_seconds()
+
+
+class DecayedCounts:
+    """
+    Decayed purchase and rating sums of a set of products at one moment
+
+    Arrays are aligned with `product_ids`. The stored sums share the factor
+    exp(`log_factor`) converting them to their value when they were copied;
+    rankings and averages do not need it.
+    """
+    __slots__ = ("product_ids", "purchases", "rating_sum", "rating_weight", "log_factor")
+
+    def __init__(self, product_ids, purchases, rating_sum, rating_weight, log_factor):
+        self.product_ids = product_ids
+        self.purchases = purchases
+        self.rating_sum = rating_sum
+        self.rating_weight = rating_weight
+        self.log_factor = log_factor
+
+    def scaled(self, values: np.ndarray) -> np.ndarray:
+        """Apply the shared factor to stored sums, in log space so it cannot overflow"""
+        with np.errstate(divide="ignore"):
+            return np.exp(np.log(values) + self.log_factor)
+
+
+class InteractionStats:
+    """
+    Incrementally maintained purchase statistics.
+
+    Tracks purchases, returns and ratings per product, and co-purchase counts
+    between products bought by the same customer. Each purchase is paired
+    with the customer's last `window` purchases only, so applying a
+    transaction costs O(window) however long the customer's history is.
+    Loaded once from the transactions table, then caught up with the rows
+    added since (by this process after each ingested chunk, or by other
+    processes every `ttl` seconds), so only new rows are ever read again.
+
+    Purchases (excluding returns) and ratings are also summed with
+    exponential time decay. A transaction at time t adds exp(rate * (t - t0))
+    for a fixed reference t0 instead of decaying every counter as time
+    passes, so each update is O(1); all counters share the factor
+    exp(-rate * (now - t0)), which rankings and averages can ignore.
+    """
+    def __init__(self, window: int, ttl: float, half_life: float):
+        self.window = window
+        self.ttl = ttl
+        self.decay_rate = math.log(2) / half_life
+        self.loaded_at: Optional[float] = None
+        # Bumped whenever the statistics change
+        self.version = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.transactions = 0
+        self.purchases: Counter = Counter()
+        self.returns: Counter = Counter()
+        self.rating_sum: Dict[int, float] = defaultdict(float)
+        self.rating_count: Counter = Counter()
+        self.co_purchases: Dict[int, Counter] = defaultdict(Counter)
+        self.history: Dict[int, Deque[int]] = {}
+        # Highest applied transaction id, and lower ids not seen yet with
+        # the time until which they are looked for
+        self.last_id = 0
+        self.gaps: "OrderedDict[int, float]" = OrderedDict()
+        self.reference: Optional[float] = None
+        self.decayed_purchases: Dict[int, float] = defaultdict(float)
+        self.decayed_rating_sum: Dict[int, float] = defaultdict(float)
+        self.decayed_rating_weight: Dict[int, float] = defaultdict(float)
+
+    def _is_fresh(self) -> bool:
+        if self.loaded_at is None:
+            return False
+        return not self.ttl or time.monotonic() - self.loaded_at < self.ttl
+
+    def _weight(self, purchase_date: Optional[datetime]) -> float:
+        """Decay weight of a transaction relative to the reference time"""
+        # Future dates count as now, so the reference never passes the
+        # current time and one bad row cannot decay everything else away
+        now = _seconds(datetime.utcnow())
+        moment = now if purchase_date is None else min(_seconds(purchase_date), now)
+        if self.reference is None:
+            self.reference = moment
+        exponent = (moment - self.reference) * self.decay_rate
+        if exponent > REBASE_EXPONENT:
+            self._rebase(moment)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rebase(self, moment: float) -> None:
+        """Move the reference time forward, scaling the decayed counters"""
+        factor = math.exp((self.reference - moment) * self.decay_rate)
+        for counters in (self.decayed_purchases, self.decayed_rating_sum, self.decayed_rating_weight):
+            for key in counters:
+                counters[key] *= factor
+        self.reference = moment
+
+    def _add(
+        self,
+        customer_id: int,
+        product_id: int,
+        is_returned: bool,
+        rating: Optional[float],
+        purchase_date: Optional[datetime]
+    ) -> None:
+        self.transactions += 1
+        if rating is not None:
+            self.rating_sum[product_id] += rating
+            self.rating_count[product_id] += 1
+        if is_returned:
+            self.returns[product_id] += 1
+            return
+        self.purchases[product_id] += 1
+        weight = self._weight(purchase_date)
+        self.decayed_purchases[product_id] += weight
+        if rating is not None:
+            self.decayed_rating_sum[product_id] += weight * rating
+            self.decayed_rating_weight[product_id] += weight
+
+        # Pair the purchase with the customer's recent purchases
+        history = self.history.get(customer_id)
+        if history is None:
+            history = self.history[customer_id] = deque(maxlen=self.window)
+        others = [other for other in history if other != product_id]
+        self.co_purchases[product_id].update(others)
+        for other in others:
+            self.co_purchases[other][product_id] += 1
+        history.append(product_id)
+
+    def _add_rows(self, rows: Iterable[Mapping]) -> None:
+        """Apply transaction rows in id order, remembering the ids they skip"""
+        added = 0
+        for row in rows:
+            if row["id"] > self.last_id:
+                self._note_gaps(range(self.last_id + 1, row["id"]))
+                self.last_id = row["id"]
+            else:
+                self.gaps.pop(row["id"], None)
+            self._add(
+                row["customer_id"],
+                row["product_id"],
+                bool(row["is_returned"]),
+                row["rating"],
+                row["purchase_date"]
+            )
+            added += 1
+        if added:
+            self.version += 1
+
+    def _note_gaps(self, ids: range) -> None:
+        deadline = time.monotonic() + GAP_TIMEOUT
+        for i in ids[-MAX_GAPS:]:
+            self.gaps[i] = deadline
+        while len(self.gaps) > MAX_GAPS:
+            self.gaps.popitem(last=False)
+
+    def _catch_up(self, db: Session) -> None:
+        """Apply the transactions added since the last catch-up (all of them at first)"""
+        now = time.monotonic()
+        # Gaps are noted in id and deadline order, so expired ones come first
+        while self.gaps and next(iter(self.gaps.values())) < now:
+            self.gaps.popitem(last=False)
+        condition = Transaction.id > self.last_id
+        if self.gaps:
+            condition = or_(condition, Transaction.id.in_(list(self.gaps)))
+        rows = (
+            db.query(
+                Transaction.id,
+                Transaction.customer_id,
+                Transaction.product_id,
+                Transaction.is_returned,
+                Transaction.rating,
+                Transaction.purchase_date
+            )
+            .filter(condition)
+            .order_by(Transaction.id)
+            .yield_per(settings.INGEST_CHUNK_SIZE)
+        )
+        self._add_rows(row._mapping for row in rows)
+
+    def ensure_loaded(self, db: Session) -> "InteractionStats":
+        """
+        Load the statistics, or catch up with new transactions, if needed
+
+        Args:
+            db: Database session used for loading
+
+        Returns:
+            self
+        """
+        if self._is_fresh():
+            return self
+        with self._lock:
+            if self._is_fresh():
+                return self
+            if self.loaded_at is None:
+                self._reset()
+            self._catch_up(db)
+            self.loaded_at = time.monotonic()
+        return self
+
+    def record(self, db: Session, commit: Callable[[], None]) -> None:
+        """
+        Commit new transactions and apply them to the statistics
+
+        Applies every transaction added since the last catch-up, including
+        those of other processes; ids make applying a row twice impossible.
+
+        Args:
+            db: Database session the transactions were written with
+            commit: Commits the rows to the database
+        """
+        commit()
+        if self.loaded_at is not None:
+            with self._lock:
+                self._catch_up(db)
+
+    def invalidate(self) -> None:
+        """Reload from the database on the next ensure_loaded()"""
+        with self._lock:
+            self.loaded_at = None
+
+    def popular(self, limit: int) -> List[Tuple[int, int]]:
+        """Most purchased products as (product ID, purchases)"""
+        return self.purchases.most_common(limit)
+
+    def co_purchased(self, product_id: int, limit: int) -> List[Tuple[int, int]]:
+        """Products most often bought with product_id as (product ID, count)"""
+        counts = self.co_purchases.get(product_id)
+        return counts.most_common(limit) if counts else []
+
+    def average_rating(self, product_id: int) -> Optional[float]:
+        count = self.rating_count.get(product_id)
+        return self.rating_sum[product_id] / count if count else None
+
+    def decayed_counts(self) -> DecayedCounts:
+        """Copy the decayed counters into arrays, consistently with each other"""
+        with self._lock:
+            count = len(self.decayed_purchases)
+            product_ids = np.fromiter(self.decayed_purchases.keys(), dtype=np.int64, count=count)
+            purchases = np.fromiter(self.decayed_purchases.values(), dtype=np.float64, count=count)
+            rating_sum = np.fromiter(
+                (self.decayed_rating_sum.get(i, 0.0) for i in self.decayed_purchases),
+                dtype=np.float64, count=count
+            )
+            rating_weight = np.fromiter(
+                (self.decayed_rating_weight.get(i, 0.0) for i in self.decayed_purchases),
+                dtype=np.float64, count=count
+            )
+            reference = self.reference
+        log_factor = 0.0
+        if reference is not None:
+            log_factor = (reference - _seconds(datetime.utcnow())) * self.decay_rate
+        return DecayedCounts(product_ids, purchases, rating_sum, rating_weight, log_factor)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "transactions": self.transactions,
+            "products": len(self.purchases),
+            "customers": len(self.history),
+            "co_purchase_products": len(self.co_purchases),
+        }
+
+
+interaction_stats = InteractionStats(
+    window=settings.INTERACTION_HISTORY_WINDOW,
+    ttl=settings.INTERACTION_STATS_TTL,
+    half_life=settings.POPULARITY_HALF_LIFE_DAYS * 86400
+)
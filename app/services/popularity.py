@@ -0,0 +1,205 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.catalog import CatalogSnapshot, ProductRow, catalog_store
+from app.services.interactions import DecayedCounts, InteractionStats, interaction_stats
+
+
+class PopularityRanking:
+    """
+    Decayed popularity of the products of one catalog snapshot.
+
+    Precomputed from the interaction statistics: purchased products ordered
+    by decayed purchases (then decayed average rating, then position), the
+    same order per category, and a rank per row for breaking ties in other
+    rankers. Top-N lookups slice the precomputed orders, so they cost O(k).
+    """
+    def __init__(self, snapshot: CatalogSnapshot, counts: DecayedCounts, version: int, build: int):
+        self.snapshot = snapshot
+        self.version = version
+        self.build = build
+        self.built_at = time.monotonic()
+        size = snapshot.size
+
+        # Map product IDs to snapshot positions, dropping deleted products
+        positions = np.minimum(np.searchsorted(snapshot.ids, counts.product_ids), max(size - 1, 0))
+        known = (snapshot.ids[positions] == counts.product_ids) if size else np.zeros(0, dtype=bool)
+        positions = positions[known]
+        # Rank on the stored sums, which share one factor; it is only
+        # applied for the reported values
+        weights = np.zeros(size)
+        weights[positions] = counts.purchases[known]
+        self.purchases = counts.scaled(weights)
+        rating_sum = np.zeros(size)
+        rating_sum[positions] = counts.rating_sum[known]
+        rating_weight = np.zeros(size)
+        rating_weight[positions] = counts.rating_weight[known]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.ratings = rating_sum / rating_weight
+
+        order = np.lexsort((np.arange(size), -np.nan_to_num(self.ratings), -weights))
+        self.rank = np.empty(size, dtype=np.int64)
+        self.rank[order] = np.arange(size)
+        self.order = order[weights[order] > 0]
+
+        # Per-category orders, and decayed totals and average ratings
+        codes = snapshot.category.codes[self.order]
+        by_category = np.argsort(codes, kind="stable")
+        sorted_codes = codes[by_category]
+        self.category_orders: Dict[int, np.ndarray] = {}
+        for code in np.unique(sorted_codes[sorted_codes >= 0]):
+            start, end = np.searchsorted(sorted_codes, [code, code + 1])
+            self.category_orders[int(code)] = self.order[by_category[start:end]]
+        categories = len(snapshot.category.values)
+        present = snapshot.category.codes >= 0
+        category_codes = snapshot.category.codes[present]
+        self.category_purchases = np.bincount(category_codes, self.purchases[present], minlength=categories)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.category_ratings = (
+                np.bincount(category_codes, rating_sum[present], minlength=categories)
+                / np.bincount(category_codes, rating_weight[present], minlength=categories)
+            )
+
+    def top(self, limit: int, category: str = None, exclude: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Most popular row positions
+
+        Args:
+            limit: Number of positions to return
+            category: Optional category filter
+            exclude: Optional row positions to leave out
+
+        Returns:
+            Row positions, most popular first
+        """
+        if category is None:
+            order = self.order
+        else:
+            order = self.category_orders.get(self.snapshot.category.code_of(category), self.order[:0])
+        if exclude is None or not len(exclude):
+            return order[:limit]
+        # Only the first limit + len(exclude) entries can survive the exclusion
+        head = order[:limit + len(exclude)]
+        return head[~np.isin(head, exclude)][:limit]
+
+    def break_ties(self, positions: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """Reorder positions ranked by scores so that equal scores put the more popular first"""
+        return positions[np.lexsort((self.rank[positions], -scores))]
+
+    def categories(self) -> List[Dict]:
+        """Decayed purchases and average rating per category, most popular first"""
+        return [
+            {
+                "category": self.snapshot.category.values[code],
+                "purchases": round(float(self.category_purchases[code]), 3),
+                "rating": None if np.isnan(self.category_ratings[code]) else round(float(self.category_ratings[code]), 3),
+            }
+            for code in np.argsort(-self.category_purchases, kind="stable")
+        ]
+
+
+class PopularityService:
+    """
+    Serves time-decayed popularity for cold-start recommendations and tie-breaks.
+
+    The ranking is precomputed per catalog snapshot from the incrementally
+    maintained decayed counters, and rebuilt when the snapshot changes or,
+    after new transactions, at most every `refresh` seconds.
+    """
+    def __init__(self, interactions: InteractionStats, refresh: float):
+        self.interactions = interactions
+        self.refresh = refresh
+        self.catalog = catalog_store
+        self._ranking: Optional[PopularityRanking] = None
+        self._builds = 0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, ranking: PopularityRanking) -> bool:
+        return ranking.version == self.interactions.version or time.monotonic() - ranking.built_at < self.refresh
+
+    def _is_current(self, ranking: Optional[PopularityRanking], snapshot: CatalogSnapshot) -> bool:
+        return ranking is not None and ranking.snapshot is snapshot and self._is_fresh(ranking)
+
+    def version(self) -> str:
+        """
+        Identify the ranking the next request will be served with
+
+        Used as a response cache key component: it changes when a ranking is
+        rebuilt, and as soon as the current one is due for a rebuild, so
+        cached responses never outlive the ranking they were ordered by.
+        """
+        ranking = self._ranking
+        if ranking is None:
+            return "0"
+        return str(ranking.build) if self._is_fresh(ranking) else f"{ranking.build}+"
+
+    def served_version(self) -> str:
+        """Identify the ranking requests are served with right now"""
+        ranking = self._ranking
+        return "0" if ranking is None else str(ranking.build)
+
+    def ranking(self, db: Session, snapshot: CatalogSnapshot) -> PopularityRanking:
+        """
+        Get the popularity ranking of a catalog snapshot
+
+        Args:
+            db: Database session, used to load the interaction statistics once
+            snapshot: Catalog snapshot
+
+        Returns:
+            Precomputed popularity ranking
+        """
+        ranking = self._ranking
+        if self._is_current(ranking, snapshot):
+            return ranking
+        with self._lock:
+            ranking = self._ranking
+            if self._is_current(ranking, snapshot):
+                return ranking
+            self.interactions.ensure_loaded(db)
+            with metrics.span("popularity.build"):
+                version = self.interactions.version
+                self._builds += 1
+                ranking = PopularityRanking(snapshot, self.interactions.decayed_counts(), version, self._builds)
+            self._ranking = ranking
+            return ranking
+
+    def popular_products(self, db: Session, limit: int, category: str = None) -> List[ProductRow]:
+        """
+        Get the most popular products
+
+        Args:
+            db: Database session
+            limit: Number of products to return
+            category: Optional category filter
+
+        Returns:
+            List of product rows, most popular first
+        """
+        snapshot = self.catalog.get(db)
+        return snapshot.rows(self.ranking(db, snapshot).top(limit, category))
+
+    def invalidate(self) -> None:
+        self._ranking = None
+
+    def stats(self) -> Dict:
+        ranking = self._ranking
+        if ranking is None:
+            return {"ranked_products": 0, "age_seconds": None, "categories": []}
+        return {
+            "ranked_products": len(ranking.order),
+            "age_seconds": round(time.monotonic() - ranking.built_at, 1),
+            "categories": ranking.categories(),
+        }
+
+
+popularity_service = PopularityService(
+    interactions=interaction_stats,
+    refresh=settings.POPULARITY_REFRESH_SECONDS
+)
@@ -0,0 +1,189 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List
+
+from pydantic import TypeAdapter
+from sqlalchemy import func, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.models.product import Product
+from app.schemas.product import ProductUpsert
+from app.services.ingestion import Chunk, IngestReport, validate_lines
+from app.services.recommendation import RecommendationService
+
+# Dialects supporting INSERT ... ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Columns overwritten when an upserted product already exists
+UPDATE_COLUMNS = (
+    "name", "category", "short_description", "description", "brand",
+    "color", "price", "currency", "tags", "content_hash",
+)
+
+
+class UpsertReport(IngestReport):
+    """Counters and the first errors of one product upsert"""
+    def __init__(self, max_errors: int):
+        super().__init__(max_errors)
+        self.created = 0
+        self.updated = 0
+        self.encoded = 0
+
+    def as_dict(self) -> Dict:
+        report = super().as_dict()
+        del report["inserted"]
+        return {**report, "created": self.created, "updated": self.updated, "encoded": self.encoded}
+
+
+class ProductUpserter:
+    """
+    Bulk-upserts products from NDJSON lines.
+
+    Lines are validated in chunks. Products with an id are upserted with
+    INSERT ... ON CONFLICT (id) DO UPDATE, products without one are
+    inserted. Each product's content hash (of the text its embedding is
+    computed from) is compared with the stored one, and only new or changed
+    products are re-encoded. Encoding runs in large batches on a background
+    thread (or a sentence-transformers process pool), overlapping with the
+    database writes of the previous chunk.
+    """
+    def __init__(self, service: RecommendationService, chunk_size: int, max_errors: int):
+        self.service = service
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.adapter = TypeAdapter(ProductUpsert)
+
+    @staticmethod
+    def deduplicate(chunks: Iterable[Chunk], report: UpsertReport) -> Iterator[Chunk]:
+        """Keep the last occurrence of an id within a chunk"""
+        for chunk in chunks:
+            last_line = {row["id"]: number for number, row in chunk if row["id"] is not None}
+            unique: Chunk = []
+            for number, row in chunk:
+                if row["id"] is not None and last_line[row["id"]] != number:
+                    report.reject(number, f"id: duplicate of line {last_line[row['id']]}")
+                else:
+                    unique.append((number, row))
+            yield unique
+
+    def prepare(
+        self,
+        db: Session,
+        chunk: Chunk,
+        report: UpsertReport,
+        reencode: bool,
+        unwritten: Dict[int, str]
+    ):
+        """
+        Hash a chunk and find the products whose embedding must be computed
+
+        Args:
+            unwritten: Content hash per id of earlier chunks not written yet;
+                they take precedence over the stored hashes they will replace
+
+        Returns:
+            Tuple of (rows to write, row indices to encode, texts to encode)
+        """
+        ids = [row["id"] for _, row in chunk if row["id"] is not None]
+        stored = dict(
+            db.query(Product.id, Product.content_hash).filter(Product.id.in_(ids))
+        ) if ids else {}
+        stored.update((i, unwritten[i]) for i in ids if i in unwritten)
+
+        rows, to_encode, texts = [], [], []
+        for number, row in chunk:
+            product_text = self.service.product_text(row["name"], row["description"], row["tags"])
+            content_hash = self.service.content_hash(product_text)
+            if row["id"] in stored:
+                report.updated += 1
+            else:
+                report.created += 1
+            if reencode or stored.get(row["id"]) != content_hash:
+                to_encode.append(len(rows))
+                texts.append(product_text)
+            rows.append({**row, "content_hash": content_hash, "embedding": None})
+        return rows, to_encode, texts
+
+    def write(self, db: Session, rows: List[Dict], to_encode: List[int], embeddings) -> None:
+        """Attach computed embeddings to a chunk, write it and commit"""
+        for index, embedding in zip(to_encode, embeddings):
+            rows[index]["embedding"] = embedding.tolist()
+
+        dialect = db.get_bind().dialect.name
+        with metrics.span("products.upsert"):
+            existing = [row for row in rows if row["id"] is not None]
+            if existing:
+                statement = UPSERT_INSERTS[dialect](Product.__table__)
+                set_ = {column: statement.excluded[column] for column in UPDATE_COLUMNS}
+                # Unchanged products are written without an embedding; keep the stored one
+                set_["embedding"] = func.coalesce(statement.excluded.embedding, Product.__table__.c.embedding)
+                db.execute(statement.on_conflict_do_update(index_elements=["id"], set_=set_), existing)
+                if dialect == "postgresql":
+                    # Explicit ids do not advance the serial sequence; move it
+                    # past them before rows without an id draw from it
+                    db.execute(text(
+                        "SELECT setval(pg_get_serial_sequence('products', 'id'), GREATEST("
+                        "(SELECT MAX(id) FROM products), "
+                        "nextval(pg_get_serial_sequence('products', 'id'))))"
+                    ))
+            new = [{k: v for k, v in row.items() if k != "id"} for row in rows if row["id"] is None]
+            if new:
+                db.execute(insert(Product.__table__), new)
+            # Core statements bypass the ORM events; bump the catalog version on commit
+            db.info["catalog_changed"] = True
+            db.commit()
+
+    def upsert(
+        self,
+        db: Session,
+        lines: Iterable[bytes],
+        pool=None,
+        reencode: bool = False
+    ) -> Dict:
+        """
+        Upsert NDJSON product lines
+
+        Each chunk is committed separately, so products of earlier chunks
+        stay written if a later chunk fails.
+
+        Args:
+            db: Database session
+            lines: NDJSON lines, one product per line, optionally with an id
+            pool: Optional sentence-transformers multi-process pool for encoding
+            reencode: Encode every product, e.g. after changing the model
+
+        Returns:
+            Received, created, updated, encoded and rejected counts and the
+            first errors
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect not in UPSERT_INSERTS:
+            raise ValueError(f"Bulk upsert is not supported on {dialect}")
+
+        report = UpsertReport(self.max_errors)
+        chunks = validate_lines(lines, self.adapter, self.chunk_size, report)
+        chunks = self.deduplicate(chunks, report)
+
+        # Encode the next chunk while the previous one is written
+        with ThreadPoolExecutor(1, thread_name_prefix="embedding") as executor:
+            pending = deque()
+            for chunk in chunks:
+                unwritten = {
+                    row["id"]: row["content_hash"]
+                    for rows, _, _ in pending for row in rows if row["id"] is not None
+                }
+                rows, to_encode, texts = self.prepare(db, chunk, report, reencode, unwritten)
+                report.encoded += len(texts)
+                pending.append((rows, to_encode, executor.submit(self.service.encode_texts, texts, pool)))
+                if len(pending) > 1:
+                    rows, to_encode, future = pending.popleft()
+                    self.write(db, rows, to_encode, future.result())
+            while pending:
+                rows, to_encode, future = pending.popleft()
+                self.write(db, rows, to_encode, future.result())
+        return report.as_dict()
@@ -1,11 +1,18 @@
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
+import hashlib
+import threading
 import numpy as np
 from sqlalchemy.orm import Session
-from typing import List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 from app.models.product import Product
 from app.models.transaction import Transaction  
+from app.services.catalog import CatalogSnapshot, ProductRow, catalog_store
+from app.services.embedding_store import EmbeddingStore
+from app.services.popularity import popularity_service
+from app.services.sharding import contiguous, sharded_scorer
 from app.core.config import settings
+from app.core.metrics import metrics
 import nltk
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
@@ -19,8 +26,21 @@ class RecommendationService:
     """
     def __init__(self):
         """Initialize the recommendation service with the BERT model"""
-        self.model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+        self.model_name = 'paraphrase-MiniLM-L6-v2'
+        self.model = SentenceTransformer(self.model_name)
+        self.embedding_store = EmbeddingStore(
+            settings.EMBEDDING_STORE_DIR,
+            self.model_name,
+            self.model.get_sentence_embedding_dimension(),
+            settings.EMBEDDING_STORE_MAX_BYTES
+        ) if settings.EMBEDDING_STORE_DIR else None
         self.stop_words = set(stopwords.words('english'))
+        self.catalog = catalog_store
+        self.scorer = sharded_scorer
+        self.popularity = popularity_service
+        # (snapshot, normalized embedding matrix, text hash -> matrix row)
+        self._product_embeddings = None
+        self._embedding_lock = threading.Lock()
 
     def preprocess_text(self, text: str) -> str:
         """
@@ -46,8 +66,10 @@ class RecommendationService:
         Returns:
             Numpy array containing text embedding
         """
-        preprocessed_text = self.preprocess_text(text)
-        return self.model.encode([preprocessed_text])[0]
+        with metrics.span("text.preprocess"):
+            preprocessed_text = self.preprocess_text(text)
+        with metrics.span("text.encode"):
+            return self.model.encode([preprocessed_text])[0]
 
     def calculate_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """
@@ -65,55 +87,227 @@ class RecommendationService:
             embedding2.reshape(1, -1)
         )[0][0]
 
+    @staticmethod
+    def product_text(name: str, description: str, tags: Optional[Sequence[str]]) -> str:
+        """
+        Build the text a product is embedded from
+
+        Args:
+            name: Product name
+            description: Product description
+            tags: Product tags
+
+        Returns:
+            Product text used for similarity search
+        """
+        return f"{name} {description} {' '.join(tags or [])}"
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """
+        Hash of a product text, used to detect content changes
+
+        Args:
+            text: Product text from product_text()
+
+        Returns:
+            Hex SHA-1 digest
+        """
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def encode_texts(self, texts: Sequence[str], pool=None) -> np.ndarray:
+        """
+        Preprocess and encode product texts in batches
+
+        Texts found in the embedding store are not encoded again; newly
+        encoded ones are appended to it.
+
+        Args:
+            texts: Product texts from product_text()
+            pool: Optional sentence-transformers multi-process pool
+
+        Returns:
+            Float32 matrix of raw (unnormalized) embeddings, one row per text
+        """
+        dimension = self.model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(texts), dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+        preprocessed = [self.preprocess_text(text) for text in texts]
+
+        missing = list(range(len(texts)))
+        if self.embedding_store is not None:
+            keys = [self.embedding_store.key(text) for text in preprocessed]
+            with metrics.span("embeddings.store_get"):
+                found, vectors = self.embedding_store.get(keys)
+            embeddings[found] = vectors
+            found = set(found)
+            missing = [i for i in missing if i not in found]
+        if not missing:
+            return embeddings
+
+        batch = [preprocessed[i] for i in missing]
+        if pool is not None:
+            encoded = self.model.encode_multi_process(
+                batch, pool, batch_size=settings.EMBEDDING_BATCH_SIZE
+            )
+        else:
+            encoded = self.model.encode(batch, batch_size=settings.EMBEDDING_BATCH_SIZE)
+        encoded = np.asarray(encoded, dtype=np.float32).reshape(len(missing), -1)
+        embeddings[missing] = encoded
+        if self.embedding_store is not None:
+            with metrics.span("embeddings.store_put"):
+                self.embedding_store.put([keys[i] for i in missing], encoded)
+        return embeddings
+
+    def load_stored_embeddings(
+        self,
+        db: Session,
+        snapshot: CatalogSnapshot,
+        positions: Sequence[int],
+        hashes: Sequence[str]
+    ) -> Dict[int, np.ndarray]:
+        """
+        Load embeddings stored with the products whose content hash matches
+
+        Args:
+            db: Database session
+            snapshot: Catalog snapshot
+            positions: Row positions to look up
+            hashes: Expected content hash per position
+
+        Returns:
+            Mapping of row position to raw embedding
+        """
+        dimension = self.model.get_sentence_embedding_dimension()
+        expected = {int(snapshot.ids[i]): (i, key) for i, key in zip(positions, hashes)}
+        ids = list(expected)
+        found = {}
+        for start in range(0, len(ids), settings.CATALOG_SNAPSHOT_BATCH_SIZE):
+            batch = ids[start:start + settings.CATALOG_SNAPSHOT_BATCH_SIZE]
+            rows = db.query(Product.id, Product.content_hash, Product.embedding).filter(
+                Product.id.in_(batch),
+                Product.content_hash.isnot(None)
+            )
+            for product_id, content_hash, embedding in rows:
+                position, key = expected[product_id]
+                if content_hash == key and embedding is not None and len(embedding) == dimension:
+                    found[position] = np.asarray(embedding, dtype=np.float32)
+        return found
+
+    def get_product_embeddings(self, snapshot: CatalogSnapshot, db: Optional[Session] = None) -> np.ndarray:
+        """
+        Get the L2-normalized embedding matrix for a catalog snapshot
+
+        The matrix is built once per snapshot. Products whose text did not
+        change since the previous snapshot reuse their previous vector;
+        otherwise the embedding stored with the product is used when its
+        content hash matches. Only the remaining texts go through the model,
+        in batches.
+
+        Args:
+            snapshot: Catalog snapshot
+            db: Optional database session for loading stored embeddings
+
+        Returns:
+            Float32 matrix with one row per snapshot product
+        """
+        cached = self._product_embeddings
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+
+        with self._embedding_lock, metrics.span("embeddings.build"):
+            cached = self._product_embeddings
+            if cached is not None and cached[0] is snapshot:
+                return cached[1]
+            previous_matrix, previous_rows = (cached[1], cached[2]) if cached else (None, {})
+
+            texts = [
+                self.product_text(snapshot.names[i], snapshot.descriptions[i], snapshot.tags_of(i))
+                for i in range(snapshot.size)
+            ]
+            keys = [self.content_hash(text) for text in texts]
+
+            matrix = np.empty(
+                (snapshot.size, self.model.get_sentence_embedding_dimension()),
+                dtype=np.float32
+            )
+            missing = []
+            for i, key in enumerate(keys):
+                row = previous_rows.get(key)
+                if row is None:
+                    missing.append(i)
+                else:
+                    matrix[i] = previous_matrix[row]
+
+            if missing and db is not None:
+                stored = self.load_stored_embeddings(db, snapshot, missing, [keys[i] for i in missing])
+                for i, embedding in stored.items():
+                    matrix[i] = self._normalize(embedding)
+                missing = [i for i in missing if i not in stored]
+
+            if missing:
+                matrix[missing] = self._normalize(self.encode_texts([texts[i] for i in missing]))
+
+            self._product_embeddings = (snapshot, matrix, {key: i for i, key in enumerate(keys)})
+            return matrix
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        norms[norms == 0] = 1
+        return embeddings / norms
+
     def get_collaborative_recommendations(
         self, 
         db: Session, 
         customer_id: int
-    ) -> List[Product]:
+    ) -> List[ProductRow]:
         """
         Get product recommendations based on collaborative filtering
         
+        Customers without purchases get the most popular products. Products
+        with equal tag overlap are ordered by popularity.
+        
         Args:
             db: Database session
             customer_id: ID of the customer to get recommendations for
             
         Returns:
-            List of recommended products
+            List of recommended product rows
         """
         # Get customer's previous purchases
-        customer_products = (
-            db.query(Product)
-            .join(Transaction)
-            .filter(Transaction.customer_id == customer_id)
-            .all()
-        )
+        with metrics.span("collaborative.db_fetch"):
+            purchased_ids = [
+                product_id for (product_id,) in
+                db.query(Transaction.product_id).filter(Transaction.customer_id == customer_id)
+            ]
+        snapshot = self.catalog.get(db)
+        purchased = snapshot.positions_of(purchased_ids)
+        popularity = self.popularity.ranking(db, snapshot)
         
-        if not customer_products:
-            return []
+        # Cold start: fall back to the most popular products
+        if not len(purchased):
+            with metrics.span("collaborative.materialize"):
+                return snapshot.rows(popularity.top(settings.TOP_N_RECOMMENDATIONS))
 
-        # Get common tags from customer's purchases
-        customer_tags = set()
-        for product in customer_products:
-            customer_tags.update(product.tags)
-        
-        # Find products with similar tags that the customer hasn't bought
-        similar_products = (
-            db.query(Product)
-            .filter(Product.id.notin_([p.id for p in customer_products]))
-            .all()
-        )
-        
-        # Score products based on tag overlap
-        scored_products = []
-        for product in similar_products:
-            product_tags = set(product.tags)
-            tag_overlap = len(customer_tags.intersection(product_tags))
-            if tag_overlap > 0:
-                scored_products.append((product, tag_overlap))
-        
-        # Sort by score and return top recommendations
-        scored_products.sort(key=lambda x: x[1], reverse=True)
-        return [p[0] for p in scored_products[:settings.TOP_N_RECOMMENDATIONS]]
+        with metrics.span("collaborative.score"):
+            # Get common tags from customer's purchases
+            customer_tags = np.unique(snapshot.tag_codes[np.isin(snapshot.tag_rows, purchased)])
+            
+            # Score products based on tag overlap, counting each distinct tag once
+            matches = np.isin(snapshot.tag_codes, customer_tags)
+            vocabulary = max(len(snapshot.tag_values), 1)
+            pairs = np.unique(snapshot.tag_rows[matches] * vocabulary + snapshot.tag_codes[matches])
+            tag_overlap = np.bincount(pairs // vocabulary, minlength=snapshot.size)
+            
+            # Only recommend products the customer hasn't bought
+            tag_overlap[purchased] = 0
+            
+            # Sort by score, then popularity, and return top recommendations
+            ranked = np.lexsort((popularity.rank, -tag_overlap))[:settings.TOP_N_RECOMMENDATIONS]
+        with metrics.span("collaborative.materialize"):
+            return snapshot.rows(ranked[tag_overlap[ranked] > 0])
 
     def search_similar_products(
         self, 
@@ -123,7 +317,7 @@ class RecommendationService:
         brand: str = None,
         min_price: float = None,
         max_price: float = None
-    ) -> List[Tuple[Product, float]]:
+    ) -> List[Tuple[ProductRow, float]]:
         """
         Search for products similar to the query text
         
@@ -136,37 +330,42 @@ class RecommendationService:
             max_price: Optional maximum price filter
             
         Returns:
-            List of tuples containing (product, similarity_score)
+            List of tuples containing (product row, similarity_score)
         """
         # Get query embedding
         query_embedding = self.get_text_embedding(query)
         
-        # Build base query
-        products_query = db.query(Product)
-        
-        # Apply filters
-        if category:
-            products_query = products_query.filter(Product.category == category)
-        if brand:
-            products_query = products_query.filter(Product.brand == brand)
-        if min_price is not None:
-            products_query = products_query.filter(Product.price >= min_price)
-        if max_price is not None:
-            products_query = products_query.filter(Product.price <= max_price)
+        # Apply filters against the catalog snapshot
+        snapshot = self.catalog.get(db)
+        with metrics.span("similar.filter"):
+            candidates = snapshot.filter_indices(
+                category=category,
+                brand=brand,
+                min_price=min_price,
+                max_price=max_price
+            )
+        if not len(candidates):
+            return []
         
-        # Get all products
-        products = products_query.all()
+        # Calculate cosine similarities against the normalized product matrix
+        query_norm = np.linalg.norm(query_embedding)
+        if query_norm:
+            query_embedding = query_embedding / query_norm
+        embeddings = self.get_product_embeddings(snapshot, db)
+        query_embedding = query_embedding.astype(np.float32)
         
-        # Calculate similarities
-        similarities = []
-        for product in products:
-            product_text = f"{product.name} {product.description} {' '.join(product.tags)}"
-            product_embedding = self.get_text_embedding(product_text)
-            similarity = self.calculate_similarity(query_embedding, product_embedding)
-            
-            if similarity >= settings.SIMILARITY_THRESHOLD:
-                similarities.append((product, similarity))
+        def score(shard: np.ndarray) -> np.ndarray:
+            # Contiguous shards (unfiltered scans) avoid copying the matrix
+            rows = contiguous(shard)
+            return embeddings[shard if rows is None else rows] @ query_embedding
         
-        # Sort by similarity score
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:settings.TOP_N_RECOMMENDATIONS]
+        # Score shards in parallel and merge their local top-N
+        with metrics.span("similar.score"):
+            candidates, scores = self.scorer.top_k(
+                score,
+                candidates,
+                settings.TOP_N_RECOMMENDATIONS,
+                settings.SIMILARITY_THRESHOLD
+            )
+        with metrics.span("similar.materialize"):
+            return [(snapshot.row(i), float(similarity)) for i, similarity in zip(candidates, scores)]
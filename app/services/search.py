@@ -1,8 +1,14 @@
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from typing import List
-from app.models.product import Product
+from app.services.catalog import CatalogSnapshot, DictionaryColumn, ProductRow, catalog_store
+from app.services.popularity import popularity_service
+from app.services.sharding import sharded_scorer
+from app.core.metrics import metrics
+from app.core.profiling import track_allocations
 from Levenshtein import ratio
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
 
 class SearchService:
     """
@@ -10,6 +16,9 @@ class SearchService:
     """
     def __init__(self):
         self.min_similarity = 0.6  # Minimum Levenshtein ratio for fuzzy matching
+        self.catalog = catalog_store
+        self.scorer = sharded_scorer
+        self.popularity = popularity_service
 
     def fuzzy_search(self, search_term: str, text: str) -> float:
         """
@@ -24,6 +33,91 @@ class SearchService:
         """
         return ratio(search_term.lower(), text.lower())
 
+    def score_field(
+        self,
+        search_terms: List[str],
+        column: DictionaryColumn,
+        candidates: np.ndarray
+    ) -> np.ndarray:
+        """
+        Best similarity of any search term against a lowercased field
+        
+        Each distinct value among the candidates is scored once, with all
+        terms in a single native call, and the result is gathered back to
+        the rows.
+        
+        Args:
+            search_terms: Lowercased search query terms
+            column: Lowercased dictionary-encoded field
+            candidates: Row positions to score
+            
+        Returns:
+            Similarity per candidate; 0 where the field is missing
+        """
+        codes, inverse = np.unique(column.codes[candidates], return_inverse=True)
+        best = np.zeros(len(codes))
+        present = codes >= 0
+        if present.any():
+            values = [column.values[code] for code in codes[present]]
+            best[present] = self.score_matrix(search_terms, values).max(axis=0)
+        return best[inverse]
+
+    def score_matrix(self, search_terms: List[str], values: List[str]) -> np.ndarray:
+        """
+        Levenshtein ratios of every search term against every value
+        
+        Args:
+            search_terms: Lowercased search query terms
+            values: Lowercased field values
+            
+        Returns:
+            Float matrix of shape (terms, values)
+        """
+        return process.cdist(
+            search_terms,
+            values,
+            scorer=Indel.normalized_similarity,
+            dtype=np.float64
+        )
+
+    def score_candidates(
+        self,
+        snapshot: CatalogSnapshot,
+        candidates: np.ndarray,
+        search_terms: List[str]
+    ) -> np.ndarray:
+        """
+        Fuzzy-match search terms against candidate products
+        
+        Args:
+            snapshot: Catalog snapshot
+            candidates: Row positions to score
+            search_terms: Search query terms
+            
+        Returns:
+            Best similarity per candidate over all terms and fields
+        """
+        if not search_terms or not len(candidates):
+            return np.zeros(len(candidates))
+        columns = snapshot.lowercase_columns()
+        terms = [term.lower() for term in search_terms]
+        
+        # One row per field: name, description, brand, tags
+        scores = np.zeros((4, len(candidates)))
+        scores[0] = self.score_field(terms, columns.name, candidates)
+        scores[1] = self.score_field(terms, columns.short_description, candidates)
+        scores[2] = self.score_field(terms, columns.brand, candidates)
+        
+        # Score the tag vocabulary once, then take the best tag of each row
+        tag_codes, tag_counts = snapshot.tag_entries(candidates)
+        if len(tag_codes):
+            tag_scores = self.score_matrix(terms, columns.tag_values).max(axis=0)[tag_codes]
+            has_tags = tag_counts > 0
+            offsets = (np.cumsum(tag_counts) - tag_counts)[has_tags]
+            scores[3, has_tags] = np.maximum.reduceat(tag_scores, offsets)
+        
+        return scores.max(axis=0)
+
     def search_products(
         self,
         db: Session,
@@ -32,7 +126,7 @@ class SearchService:
         brand: str = None,
         min_price: float = None,
         max_price: float = None
-    ) -> List[Product]:
+    ) -> List[ProductRow]:
         """
         Search for products using fuzzy matching and filters
         
@@ -45,54 +139,35 @@ class SearchService:
             max_price: Optional maximum price filter
             
         Returns:
-            List of matching products
+            List of matching product rows
         """
-        # Start with base query
-        products = db.query(Product)
-        
-        # Apply filters if provided
-        if category:
-            products = products.filter(Product.category == category)
-        if brand:
-            products = products.filter(Product.brand == brand)
-        if min_price is not None:
-            products = products.filter(Product.price >= min_price)
-        if max_price is not None:
-            products = products.filter(Product.price <= max_price)
+        snapshot = self.catalog.get(db)
         
-        # Get all products that might match
-        all_products = products.all()
+        # Apply filters against the catalog snapshot
+        with metrics.span("search.filter"):
+            candidates = snapshot.filter_indices(
+                category=category,
+                brand=brand,
+                min_price=min_price,
+                max_price=max_price
+            )
         
-        # Perform fuzzy matching on product names and descriptions
-        matched_products = []
+        # Perform fuzzy matching on product names and descriptions, one
+        # shard per thread for large scans
         search_terms = query.split()
+        with metrics.span("search.fuzzy_score"), track_allocations("search.fuzzy_score"):
+            positions, scores = self.scorer.top_k(
+                lambda shard: self.score_candidates(snapshot, shard, search_terms),
+                candidates,
+                len(candidates),
+                self.min_similarity
+            )
         
-        for product in all_products:
-            # Check each search term against product fields
-            max_similarity = 0
-            for term in search_terms:
-                # Check similarity with name
-                name_similarity = self.fuzzy_search(term, product.name)
-                max_similarity = max(max_similarity, name_similarity)
-                
-                # Check similarity with description
-                desc_similarity = self.fuzzy_search(term, product.short_description)
-                max_similarity = max(max_similarity, desc_similarity)
-                
-                # Check similarity with brand
-                brand_similarity = self.fuzzy_search(term, product.brand)
-                max_similarity = max(max_similarity, brand_similarity)
-                
-                # Check similarity with tags
-                for tag in product.tags:
-                    tag_similarity = self.fuzzy_search(term, tag)
-                    max_similarity = max(max_similarity, tag_similarity)
-            
-            if max_similarity >= self.min_similarity:
-                matched_products.append((product, max_similarity))
-        
-        # Sort by similarity score
-        matched_products.sort(key=lambda x: x[1], reverse=True)
+        # Equally good matches are ordered by popularity
+        with metrics.span("search.tie_break"):
+            positions = self.popularity.ranking(db, snapshot).break_ties(positions, scores)
         
-        # Return only the products, without scores
-        return [p[0] for p in matched_products]
+        # Materialize only the matched rows, without scores
+        with metrics.span("search.materialize"):
+            return snapshot.rows(positions)
+
@@ -0,0 +1,121 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def contiguous(candidates: np.ndarray) -> Optional[slice]:
+    """Return the equivalent slice if candidates are consecutive positions"""
+    if len(candidates) and candidates[-1] - candidates[0] == len(candidates) - 1:
+        return slice(int(candidates[0]), int(candidates[-1]) + 1)
+    return None
+
+
+def local_top_k(positions: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep the k best scores of a shard, unordered
+
+    Args:
+        positions: Row positions of the shard, ascending
+        scores: Score per position
+
+    Returns:
+        Tuple of (positions, scores) of at most k entries
+    """
+    if len(scores) > k:
+        # Ties at the cut-off must keep the lowest positions, like a stable sort
+        kth = np.partition(-scores, k - 1)[k - 1]
+        keep = np.flatnonzero(-scores < kth)
+        ties = np.flatnonzero(-scores == kth)[:k - len(keep)]
+        keep = np.concatenate([keep, ties])
+        positions, scores = positions[keep], scores[keep]
+    return positions, scores
+
+
+def merge_top_k(
+    shards: List[Tuple[np.ndarray, np.ndarray]],
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge local top-k results into the global top k
+
+    Args:
+        shards: (positions, scores) per shard
+        k: Number of results to keep
+
+    Returns:
+        Tuple of (positions, scores) ordered by score descending, then position
+    """
+    positions = np.concatenate([p for p, _ in shards])
+    scores = np.concatenate([s for _, s in shards])
+    order = np.lexsort((positions, -scores))[:k]
+    return positions[order], scores[order]
+
+
+class ShardedScorer:
+    """
+    Splits catalog scans into contiguous shards scored in parallel.
+
+    Shards run on a thread pool: the scoring kernels (NumPy matrix products,
+    rapidfuzz batch calls) release the GIL, so threads use all cores without
+    copying the catalog into other processes. Scans smaller than two shards
+    are scored inline.
+    """
+    def __init__(self, workers: int, shard_size: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def split(self, candidates: np.ndarray) -> List[np.ndarray]:
+        """Split candidate positions into at most one shard per worker"""
+        count = min(self.workers, len(candidates) // max(self.shard_size, 1))
+        if count <= 1:
+            return [candidates]
+        return np.array_split(candidates, count)
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix="scoring")
+            return self._threads
+
+    def top_k(
+        self,
+        score: Callable[[np.ndarray], np.ndarray],
+        candidates: np.ndarray,
+        k: int,
+        threshold: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score candidates shard by shard on threads and keep the best k
+
+        Args:
+            score: Returns the scores of an array of row positions; must be
+                thread-safe and should release the GIL
+            candidates: Row positions, ascending
+            k: Number of results to keep
+            threshold: Minimum score to keep
+
+        Returns:
+            Tuple of (positions, scores) ordered by score descending, then position
+        """
+        def score_shard(shard: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            scores = score(shard)
+            keep = scores >= threshold
+            return local_top_k(shard[keep], scores[keep], k)
+
+        shards = self.split(candidates)
+        if len(shards) == 1:
+            return merge_top_k([score_shard(shards[0])], k)
+        return merge_top_k(list(self._thread_pool().map(score_shard, shards)), k)
+
+
+sharded_scorer = ShardedScorer(
+    workers=settings.SCORING_WORKERS,
+    shard_size=settings.SCORING_SHARD_SIZE
+)
@@ -1,13 +1,14 @@
 # app/utils/data_generator.py
 from faker import Faker
 from app.db.base import SessionLocal
+from sqlalchemy.orm import load_only
 from app.models.customer import Customer, Gender
 from app.models.product import Product
 from app.models.transaction import Transaction
 import random
 from datetime import datetime, timedelta
 from typing import List
-from sentence_transformers import SentenceTransformer
+from app.services.recommendation import RecommendationService
 
 fake = Faker()
 
@@ -40,7 +41,8 @@ class DataGenerator:
     Utility class for generating sample data for the product recommendation system
     """
     def __init__(self):
-        self.model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+        self.recommendation = RecommendationService()
+        self.model = self.recommendation.model
         self.db = SessionLocal()
 
     def generate_customers(self, num_customers: int) -> List[Customer]:
@@ -105,6 +107,7 @@ class DataGenerator:
             List of generated Product objects
         """
         products = []
+        product_texts = []
         for _ in range(num_products):
             category = random.choice(list(PRODUCT_CATEGORIES.keys()))
             brand = random.choice(list(BRANDS.keys()))
@@ -118,12 +121,13 @@ class DataGenerator:
             tags.extend(random.sample(["trending", "bestseller", "new", "limited", "sale"], 
                                    random.randint(1, 3)))
             
-            # Create product text for embedding
-            product_text = f"{category} {brand} {short_desc} {long_desc} {' '.join(tags)}"
-            embedding = self.model.encode([product_text])[0].tolist()
+            name = f"{brand} {category.title()} {random.randint(1000, 9999)}"
+            # Embed the same text the recommendation service does
+            product_text = self.recommendation.product_text(name, long_desc, tags)
+            product_texts.append(product_text)
             
             product = Product(
-                name=f"{brand} {category.title()} {random.randint(1000, 9999)}",
+                name=name,
                 category=category,
                 short_description=short_desc,
                 description=long_desc,
@@ -132,10 +136,15 @@ class DataGenerator:
                 price=round(random.uniform(price_range[0], price_range[1]), 2),
                 currency="USD",
                 tags=tags,
-                embedding=embedding
+                content_hash=self.recommendation.content_hash(product_text)
             )
             products.append(product)
         
+        # Encode in batches; texts already in the embedding store are reused
+        embeddings = self.recommendation.encode_texts(product_texts)
+        for product, embedding in zip(products, embeddings):
+            product.embedding = embedding.tolist()
+        
         self.db.add_all(products)
         self.db.commit()
         return products
@@ -151,7 +160,7 @@ class DataGenerator:
             List of generated Transaction objects
         """
         customers = self.db.query(Customer).all()
-        products = self.db.query(Product).all()
+        products = self.db.query(Product).options(load_only(Product.id, Product.price)).all()
         
         transactions = []
         start_date = datetime.now() - timedelta(days=365)
@@ -0,0 +1,55 @@
+# app/utils/load_products.py
+"""
+Bulk-upsert products from an NDJSON file.
+
+Each line is a product object in the ProductCreate shape, optionally with an
+"id" to update an existing product. Only products whose name, description or
+tags changed are re-encoded.
+
+Usage:
+    python -m app.utils.load_products products.ndjson --encode-workers 4
+    cat products.ndjson | python -m app.utils.load_products -
+"""
+import argparse
+import json
+import sys
+import time
+
+from app.db.base import SessionLocal
+from app.core.config import settings
+from app.services.product_upsert import ProductUpserter
+from app.services.recommendation import RecommendationService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-upsert products from an NDJSON file")
+    parser.add_argument("path", help="NDJSON file, or - for standard input")
+    parser.add_argument("--chunk-size", type=int, default=settings.PRODUCT_UPSERT_CHUNK_SIZE)
+    parser.add_argument("--encode-workers", type=int, default=0,
+                        help="Encode with a pool of this many processes (0 encodes in-process)")
+    parser.add_argument("--reencode", action="store_true",
+                        help="Re-encode every product, e.g. after changing the model")
+    args = parser.parse_args()
+
+    service = RecommendationService()
+    upserter = ProductUpserter(service, chunk_size=args.chunk_size, max_errors=settings.INGEST_MAX_ERRORS)
+    pool = service.model.start_multi_process_pool(["cpu"] * args.encode_workers) if args.encode_workers else None
+
+    db = SessionLocal()
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    start = time.perf_counter()
+    try:
+        report = upserter.upsert(db, source, pool=pool, reencode=args.reencode)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        db.close()
+        if pool is not None:
+            service.model.stop_multi_process_pool(pool)
+
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# benchmarks/bench_hot_paths.py
+"""
+Benchmark search and recommendation hot paths at scaled catalog sizes.
+
+Seeds one SQLite database per catalog size (reused across runs), then measures
+latency percentiles and throughput for SearchService.search_products,
+RecommendationService.search_similar_products and
+get_collaborative_recommendations, both in-process and through the FastAPI
+app via an ASGI client. Results are written as JSON so runs can be compared
+across commits.
+
+Usage:
+    python -m benchmarks.bench_hot_paths --sizes 1000 100000 1000000 \\
+        --output bench_results.json
+
+Pass a PostgreSQL URL with --database-url (containing "{size}", e.g.
+postgresql://postgres@localhost/bench_{size}) to benchmark against Postgres.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# The app module creates its engine and tables on import, so point it at a
+# throwaway SQLite database and keep the response cache out of the timings
+# unless the caller configured otherwise.
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + str(Path("bench_data") / "app.db"))
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+Path("bench_data").mkdir(exist_ok=True)
+
+from sqlalchemy import create_engine, func, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db.base import Base, get_db  # noqa: E402
+from app.models.customer import Customer, Gender  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.transaction import Transaction  # noqa: E402
+from app.utils.data_generator import BRANDS, COLORS, PRODUCT_CATEGORIES  # noqa: E402
+
+EXTRA_TAGS = ["trending", "bestseller", "new", "limited", "sale"]
+ADJECTIVES = ["Stylish", "Modern", "Comfortable", "Trendy", "Classic", "Elegant"]
+MATERIALS = ["cotton", "polyester", "denim", "wool", "linen"]
+SEARCH_QUERIES = [
+    "nike", "zara jacket", "casual cotton", "summer dress", "winter warm",
+    "adidas shoes", "levis trousers", "elegant party", "sports", "denim",
+]
+SIMILAR_QUERIES = [
+    "comfortable shoes for running", "warm winter jacket", "elegant party dress",
+    "casual cotton t-shirt", "formal trousers for work", "summer outfit",
+]
+INSERT_CHUNK = 10000
+
+
+def seed(url: str, size: int, transactions_per_product: float, seed_value: int) -> Dict[str, int]:
+    """
+    Create and fill a benchmark database unless it already holds the catalog
+
+    Args:
+        url: Database URL
+        size: Number of products
+        transactions_per_product: Transactions to generate per product
+        seed_value: Random seed
+
+    Returns:
+        Row counts per table
+    """
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed_value)
+    num_customers = max(100, size // 100)
+    num_transactions = int(size * transactions_per_product)
+
+    with engine.begin() as conn:
+        existing = conn.execute(func.count(Product.id).select()).scalar()
+        if existing == size:
+            return {
+                "products": size,
+                "customers": conn.execute(func.count(Customer.id).select()).scalar(),
+                "transactions": conn.execute(func.count(Transaction.id).select()).scalar(),
+            }
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+        categories = list(PRODUCT_CATEGORIES)
+        brands = list(BRANDS)
+        for start in range(0, size, INSERT_CHUNK):
+            rows = []
+            for product_id in range(start + 1, min(start + INSERT_CHUNK, size) + 1):
+                category = rng.choice(categories)
+                brand = rng.choice(brands)
+                low, high = BRANDS[brand]
+                tags = PRODUCT_CATEGORIES[category] + rng.sample(EXTRA_TAGS, rng.randint(1, 3))
+                rows.append({
+                    "id": product_id,
+                    "name": f"{brand} {category.title()} {rng.randint(1000, 9999)}",
+                    "category": category,
+                    "short_description": f"{rng.choice(ADJECTIVES)} {category} by {brand}",
+                    "description": f"This {rng.choice(ADJECTIVES).lower()} {category} from {brand} "
+                                   f"is made from high-quality {rng.choice(MATERIALS)}.",
+                    "brand": brand,
+                    "color": rng.choice(COLORS),
+                    "price": round(rng.uniform(low, high), 2),
+                    "currency": "USD",
+                    "tags": tags,
+                })
+            conn.execute(insert(Product), rows)
+
+        conn.execute(insert(Customer), [
+            {
+                "id": customer_id,
+                "name": f"Customer {customer_id}",
+                "age": rng.randint(18, 70),
+                "gender": rng.choice(list(Gender)),
+                "city": "City",
+                "country": "Country",
+                "email": f"customer{customer_id}@example.com",
+                "phone": "555-0100",
+            }
+            for customer_id in range(1, num_customers + 1)
+        ])
+
+        for start in range(0, num_transactions, INSERT_CHUNK):
+            conn.execute(insert(Transaction), [
+                {
+                    "product_id": rng.randint(1, size),
+                    "customer_id": rng.randint(1, num_customers),
+                    "amount_paid": round(rng.uniform(10, 200), 2),
+                    "purchase_date": datetime(2024, 1, 1),
+                    "is_returned": rng.random() < 0.1,
+                    "rating": round(rng.uniform(3.0, 5.0), 1),
+                }
+                for _ in range(min(INSERT_CHUNK, num_transactions - start))
+            ])
+
+    engine.dispose()
+    return {"products": size, "customers": num_customers, "transactions": num_transactions}
+
+
+def summarize(durations: List[float], wall: float) -> Dict[str, float]:
+    """Latency percentiles (ms) and throughput (ops/s) for a run"""
+    ordered = sorted(durations)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1],
+        "throughput_ops": len(ordered) / wall if wall else 0.0,
+    }
+
+
+def measure(call: Callable[[int], object], iterations: int) -> Dict[str, float]:
+    """Run call(i) iterations times and summarize the latencies"""
+    durations = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        call(i)
+        durations.append((time.perf_counter() - start) * 1000)
+    return summarize(durations, time.perf_counter() - started)
+
+
+async def measure_async(call, iterations: int) -> Dict[str, float]:
+    """Async counterpart of measure()"""
+    durations = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        await call(i)
+        durations.append((time.perf_counter() - start) * 1000)
+    return summarize(durations, time.perf_counter() - started)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_size(args, size: int, counts: Dict[str, int], url: str) -> List[Dict]:
+    import httpx
+    from app.api import endpoints
+    from app.core.cache import catalog_version
+    from app.core.config import settings
+    from app.main import app
+
+    engine = create_engine(url)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    rng = random.Random(args.seed)
+    customers = [rng.randint(1, counts["customers"]) for _ in range(args.iterations)]
+
+    # Drop any snapshot, interaction stats and popularity ranking built for
+    # the previous catalog size
+    endpoints.search_service.catalog.invalidate()
+    endpoints.interaction_stats.invalidate()
+    endpoints.popularity_service.invalidate()
+    catalog_version.bump()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    ops = {
+        "search": (
+            lambda db, i: endpoints.search_service.search_products(
+                db=db, query=SEARCH_QUERIES[i % len(SEARCH_QUERIES)]
+            ),
+            lambda i: ("/search/", {"query": SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}),
+        ),
+        "similar": (
+            lambda db, i: endpoints.recommendation_service.search_similar_products(
+                db=db, query=SIMILAR_QUERIES[i % len(SIMILAR_QUERIES)]
+            ),
+            lambda i: ("/recommendations/similar/", {"query": SIMILAR_QUERIES[i % len(SIMILAR_QUERIES)]}),
+        ),
+        "collaborative": (
+            lambda db, i: endpoints.recommendation_service.get_collaborative_recommendations(
+                db=db, customer_id=customers[i]
+            ),
+            lambda i: (f"/recommendations/collaborative/{customers[i]}", {}),
+        ),
+    }
+
+    results = []
+    for name in args.ops:
+        service_call, http_call = ops[name]
+
+        # The first call builds the catalog snapshot (and embedding matrix)
+        with Session() as db:
+            start = time.perf_counter()
+            service_call(db, 0)
+            warmup_ms = (time.perf_counter() - start) * 1000
+
+        if "inprocess" in args.modes:
+            with Session() as db:
+                stats = measure(lambda i: service_call(db, i), args.iterations)
+            results.append({"size": size, "op": name, "mode": "inprocess",
+                            "warmup_ms": warmup_ms, **stats})
+            print(f"{size:>9} {name:>13} inprocess p50={stats['p50_ms']:9.2f}ms "
+                  f"p99={stats['p99_ms']:9.2f}ms {stats['throughput_ops']:9.1f} ops/s")
+
+        if "asgi" in args.modes:
+            async def run_http():
+                async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+                    async def call(i):
+                        path, params = http_call(i)
+                        response = await client.get(settings.API_V1_STR + path, params=params)
+                        response.raise_for_status()
+                    return await measure_async(call, args.iterations)
+
+            stats = asyncio.run(run_http())
+            results.append({"size": size, "op": name, "mode": "asgi",
+                            "warmup_ms": warmup_ms, **stats})
+            print(f"{size:>9} {name:>13}      asgi p50={stats['p50_ms']:9.2f}ms "
+                  f"p99={stats['p99_ms']:9.2f}ms {stats['throughput_ops']:9.1f} ops/s")
+
+    app.dependency_overrides.pop(get_db, None)
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--ops", nargs="+", default=["search", "similar", "collaborative"],
+                        choices=["search", "similar", "collaborative"])
+    parser.add_argument("--modes", nargs="+", default=["inprocess", "asgi"],
+                        choices=["inprocess", "asgi"])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--transactions-per-product", type=float, default=2.0)
+    parser.add_argument("--database-url", default="sqlite:///bench_data/catalog_{size}.db",
+                        help="Database URL template; {size} is replaced by the catalog size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "datasets": [],
+        "results": [],
+    }
+
+    for size in args.sizes:
+        url = args.database_url.format(size=size)
+        start = time.perf_counter()
+        counts = seed(url, size, args.transactions_per_product, args.seed)
+        report["datasets"].append({**counts, "seed_s": time.perf_counter() - start})
+        report["results"].extend(run_size(args, size, counts, url))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
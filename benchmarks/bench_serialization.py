@@ -0,0 +1,115 @@
+# benchmarks/bench_serialization.py
+"""
+Compare the response_model serialization path with the trusted-row path.
+
+The response_model path is what FastAPI does for `List[ProductInDB]`: validate
+ORM objects with from_attributes, run jsonable_encoder and render with the
+standard json module. The fast path renders column rows with orjson.
+
+Usage:
+    python -m benchmarks.bench_serialization --items 100 500 1000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Callable, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy.engine.result import result_tuple
+
+import app.db  # noqa: F401  registers all models before Product is instantiated
+from app.api.responses import product_rows_response, product_scores_response
+from app.models.product import Product, PRODUCT_RESPONSE_COLUMNS
+from app.schemas.product import ProductInDB, ProductRecommendation
+
+COLUMN_NAMES = [column.key for column in PRODUCT_RESPONSE_COLUMNS]
+make_row = result_tuple(COLUMN_NAMES)
+
+
+def make_values(product_id: int) -> dict:
+    """Build one synthetic product record"""
+    return {
+        "id": product_id,
+        "name": f"Brand Item {product_id}",
+        "category": random.choice(["t-shirt", "trousers", "dress", "jacket", "shoes"]),
+        "short_description": "Stylish jacket by Brand",
+        "description": "This modern jacket from Brand is made from high-quality cotton. " * 3,
+        "brand": random.choice(["Zara", "H&M", "Nike", "Adidas"]),
+        "color": random.choice(["Black", "White", "Red"]),
+        "price": round(random.uniform(10, 200), 2),
+        "currency": "USD",
+        "tags": ["casual", "summer", "cotton", "trending"],
+    }
+
+
+def timeit(func: Callable[[], object], repeat: int) -> List[float]:
+    """Run func repeat times and return per-call durations in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def run(items: int, repeat: int) -> None:
+    values = [make_values(i) for i in range(items)]
+    embedding = [random.random() for _ in range(384)]
+    orm_products = [Product(embedding=embedding, **v) for v in values]
+    rows = [make_row(tuple(v[name] for name in COLUMN_NAMES)) for v in values]
+    scores = [random.random() for _ in range(items)]
+
+    loop = asyncio.new_event_loop()
+    list_field = create_response_field(name="list", type_=List[ProductInDB])
+    rec_field = create_response_field(name="recs", type_=List[ProductRecommendation])
+
+    def model_list():
+        content = loop.run_until_complete(
+            serialize_response(field=list_field, response_content=orm_products)
+        )
+        return JSONResponse(content).body
+
+    def model_recs():
+        recs = [
+            ProductRecommendation(product=p, similarity_score=s)
+            for p, s in zip(orm_products, scores)
+        ]
+        content = loop.run_until_complete(
+            serialize_response(field=rec_field, response_content=recs)
+        )
+        return JSONResponse(content).body
+
+    def fast_list():
+        return product_rows_response(rows).body
+
+    def fast_recs():
+        return product_scores_response(zip(rows, scores)).body
+
+    for label, slow, fast in (
+        ("products", model_list, fast_list),
+        ("recommendations", model_recs, fast_recs),
+    ):
+        slow_ms = statistics.median(timeit(slow, repeat))
+        fast_ms = statistics.median(timeit(fast, repeat))
+        print(
+            f"{label:>16} items={items:<6} response_model={slow_ms:8.2f}ms "
+            f"fast={fast_ms:8.2f}ms speedup={slow_ms / fast_ms:5.1f}x"
+        )
+    loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[50, 200, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    for items in args.items:
+        run(items, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
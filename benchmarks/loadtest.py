@@ -0,0 +1,400 @@
+# benchmarks/loadtest.py
+"""
+Open-loop load test with a realistic traffic mix and an SLO report.
+
+Drives the API with a weighted mix of search, similarity, collaborative,
+popular and product list calls. Requests arrive as a Poisson process at each
+offered rate in turn, independently of how fast responses come back, and
+latency is measured from the scheduled arrival so queueing is included.
+Search and similarity queries, customers and list pages are drawn with
+Zipf-distributed popularity. For each rate and endpoint the report gives
+throughput, latency percentiles and errors, and whether p99 met the SLO; the
+highest rate meeting it is the sustainable capacity.
+
+Usage:
+    # In-process ASGI app against a seeded SQLite catalog
+    python -m benchmarks.loadtest --size 100000 --rates 5 10 20 40 80
+
+    # A running server, e.g. python -m app.serve --workers 1
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --customers 1000 \\
+        --products 100000 --rates 10 20 40 --slo-p99-ms 200 --endpoint-slo similar=400
+
+The response cache stays enabled unless RESPONSE_CACHE_ENABLED=false is set,
+since repeated popular queries are part of the realistic mix. In-process runs
+share one event loop between the load generator and the app, so they measure
+a single worker including client overhead; use --url for a real server.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Repeated popular queries should hit the response cache like in production
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "true")
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from benchmarks.bench_hot_paths import (  # noqa: E402
+    SEARCH_QUERIES, SIMILAR_QUERIES, git_revision, seed, summarize
+)
+from app.core.config import settings  # noqa: E402
+from app.db.base import get_db  # noqa: E402
+from app.utils.data_generator import BRANDS, PRODUCT_CATEGORIES  # noqa: E402
+
+ENDPOINTS = ["search", "similar", "collaborative", "popular", "products"]
+DEFAULT_MIX = ["search=40", "similar=20", "collaborative=25", "popular=5", "products=10"]
+DESCRIPTORS = ["casual", "formal", "summer", "winter", "warm", "elegant", "cotton",
+               "denim", "sports", "comfortable", "party", "outdoor"]
+
+# (endpoint name, path, query parameters)
+Request = Tuple[str, str, Dict]
+
+
+class Zipf:
+    """Samples ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** exponent"""
+    def __init__(self, n: int, exponent: float, rng: random.Random):
+        self.rng = rng
+        self.cumulative = []
+        total = 0.0
+        for rank in range(n):
+            total += 1.0 / (rank + 1) ** exponent
+            self.cumulative.append(total)
+
+    def sample(self) -> int:
+        rank = bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+        return min(rank, len(self.cumulative) - 1)
+
+
+def query_pool(base: List[str], size: int, rng: random.Random) -> List[str]:
+    """The base queries, most popular first, followed by a long tail of generated ones"""
+    tail = set()
+    brands = [brand.lower() for brand in BRANDS]
+    categories = list(PRODUCT_CATEGORIES)
+    while len(tail) < size - len(base):
+        words = [rng.choice(brands), rng.choice(DESCRIPTORS), rng.choice(categories)]
+        tail.add(" ".join(rng.sample(words, rng.randint(1, 3))))
+    tail -= set(base)
+    return base + sorted(tail)
+
+
+class Workload:
+    """
+    Draws requests from an endpoint mix
+
+    Queries, customers and product list pages follow Zipf popularity. The
+    most popular customers are a random subset, not the lowest IDs.
+    """
+    def __init__(
+        self,
+        mix: Dict[str, float],
+        customers: int,
+        products: int,
+        exponent: float,
+        page_size: int,
+        rng: random.Random
+    ):
+        self.rng = rng
+        self.names = list(mix)
+        self.cumulative = []
+        total = 0.0
+        for name in self.names:
+            total += mix[name]
+            self.cumulative.append(total)
+        self.search_queries = query_pool(SEARCH_QUERIES, 500, rng)
+        self.similar_queries = query_pool(SIMILAR_QUERIES, 500, rng)
+        self.search_rank = Zipf(len(self.search_queries), exponent, rng)
+        self.similar_rank = Zipf(len(self.similar_queries), exponent, rng)
+        self.customer_ids = list(range(1, customers + 1))
+        rng.shuffle(self.customer_ids)
+        self.customer_rank = Zipf(len(self.customer_ids), exponent, rng)
+        self.page_size = page_size
+        self.page_rank = Zipf(max(1, math.ceil(products / page_size)), exponent, rng)
+        self.categories = list(PRODUCT_CATEGORIES)
+
+    def next(self) -> Request:
+        """Draw the next request from the mix"""
+        return self.request(self.names[bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])])
+
+    def request(self, name: str) -> Request:
+        """Draw a request for one endpoint"""
+        if name == "search":
+            return name, "/search/", {"query": self.search_queries[self.search_rank.sample()]}
+        if name == "similar":
+            return name, "/recommendations/similar/", {"query": self.similar_queries[self.similar_rank.sample()]}
+        if name == "collaborative":
+            customer_id = self.customer_ids[self.customer_rank.sample()]
+            return name, f"/recommendations/collaborative/{customer_id}", {}
+        if name == "popular":
+            params = {"category": self.rng.choice(self.categories)} if self.rng.random() < 0.5 else {}
+            return name, "/recommendations/popular/", params
+        skip = self.page_rank.sample() * self.page_size
+        return name, "/products/", {"skip": skip, "limit": self.page_size}
+
+
+async def run_step(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    rate: float,
+    duration: float,
+    max_in_flight: int,
+    timeout: float,
+    rng: random.Random
+) -> Tuple[Dict[str, List[float]], Counter, Counter, float]:
+    """
+    Send Poisson arrivals at one offered rate for duration seconds
+
+    Arrivals are never delayed by slow responses. An arrival that finds
+    max_in_flight requests outstanding is dropped, and a request without a
+    response after timeout seconds fails; both count as errors.
+
+    Returns:
+        Tuple of (latencies in ms per endpoint, errors per endpoint,
+        drops per endpoint, elapsed seconds including the drain)
+    """
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Counter = Counter()
+    dropped: Counter = Counter()
+    pending = set()
+    in_flight = 0
+
+    async def send(name: str, path: str, params: Dict, scheduled: float) -> None:
+        nonlocal in_flight
+        try:
+            # The ASGI transport ignores client timeouts, so enforce them here
+            response = await asyncio.wait_for(client.get(settings.API_V1_STR + path, params=params), timeout)
+            ok = response.status_code < 400
+        except (httpx.HTTPError, asyncio.TimeoutError):
+            ok = False
+        finally:
+            in_flight -= 1
+        if ok:
+            latencies[name].append((time.perf_counter() - scheduled) * 1000)
+        else:
+            errors[name] += 1
+
+    start = time.perf_counter()
+    scheduled = start
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name, path, params = workload.next()
+        if in_flight >= max_in_flight:
+            dropped[name] += 1
+            continue
+        in_flight += 1
+        task = asyncio.create_task(send(name, path, params, scheduled))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+    return latencies, errors, dropped, time.perf_counter() - start
+
+
+def step_report(
+    rate: float,
+    duration: float,
+    latencies: Dict[str, List[float]],
+    errors: Counter,
+    dropped: Counter,
+    elapsed: float,
+    slos: Dict[str, float],
+    max_error_rate: float
+) -> Dict:
+    """Summarize one offered rate per endpoint and overall, with the SLO verdicts"""
+    endpoints = {}
+    names = sorted(set(latencies) | set(errors) | set(dropped), key=ENDPOINTS.index)
+    for name in names + ["all"]:
+        if name == "all":
+            samples = [latency for values in latencies.values() for latency in values]
+            failed = sum(errors.values()) + sum(dropped.values())
+        else:
+            samples = latencies[name]
+            failed = errors[name] + dropped[name]
+        attempts = len(samples) + failed
+        stats = summarize(samples, elapsed) if samples else {"n": 0}
+        error_rate = failed / attempts if attempts else 0.0
+        slo = min(slos.values()) if name == "all" else slos[name]
+        endpoints[name] = {
+            **stats,
+            "offered_rps": attempts / duration,
+            "errors": errors[name] if name != "all" else sum(errors.values()),
+            "dropped": dropped[name] if name != "all" else sum(dropped.values()),
+            "error_rate": error_rate,
+            "slo_p99_ms": slo,
+            "meets_slo": bool(samples) and stats["p99_ms"] <= slo and error_rate <= max_error_rate,
+        }
+    # Overall means every endpoint met its own SLO
+    endpoints["all"]["meets_slo"] = all(endpoints[name]["meets_slo"] for name in names)
+    return {"rate": rate, "elapsed_s": elapsed, "endpoints": endpoints}
+
+
+def capacity(steps: List[Dict]) -> Dict[str, Optional[float]]:
+    """Highest total offered rate, per endpoint, up to which every step met the SLO"""
+    result = {}
+    names = {name for step in steps for name in step["endpoints"]}
+    for name in sorted(names, key=lambda n: ENDPOINTS.index(n) if n in ENDPOINTS else len(ENDPOINTS)):
+        best = None
+        for step in steps:
+            endpoint = step["endpoints"].get(name)
+            if endpoint is None:
+                continue
+            if not endpoint["meets_slo"]:
+                break
+            best = step["rate"]
+        result[name] = best
+    return result
+
+
+def print_step(step: Dict) -> None:
+    for name, endpoint in step["endpoints"].items():
+        print(f"{step['rate']:>8.1f} {name:>13} {endpoint['offered_rps']:8.1f} "
+              f"{endpoint.get('throughput_ops', 0.0):8.1f} {endpoint.get('p50_ms', math.nan):9.1f} "
+              f"{endpoint.get('p99_ms', math.nan):9.1f} "
+              f"{endpoint['error_rate'] * 100:6.1f}% {'ok' if endpoint['meets_slo'] else 'VIOLATED':>8}")
+
+
+def parse_pairs(pairs: List[str], option: str) -> Dict[str, float]:
+    values = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        if name not in ENDPOINTS or not value:
+            raise SystemExit(f"{option}: expected ENDPOINT=VALUE with ENDPOINT in {', '.join(ENDPOINTS)}, got {pair!r}")
+        values[name] = float(value)
+    return values
+
+
+def in_process_client(args) -> Tuple[httpx.AsyncClient, Dict[str, int]]:
+    """Seed the catalog and wrap the ASGI app in a client"""
+    from app.main import app
+
+    url = args.database_url.format(size=args.size)
+    counts = seed(url, args.size, args.transactions_per_product, args.seed)
+    engine = create_engine(url)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    # App exceptions become 500 responses, counted as errors
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+    return client, counts
+
+
+async def run(args, client: httpx.AsyncClient, workload: Workload, slos: Dict[str, float]) -> List[Dict]:
+    rng = random.Random(args.seed)
+    async with client:
+        # Build the catalog snapshot, embedding matrix and popularity ranking first
+        for name in workload.names:
+            _, path, params = workload.request(name)
+            await client.get(settings.API_V1_STR + path, params=params)
+
+        steps = []
+        print(f"{'rate':>8} {'endpoint':>13} {'offered':>8} {'done/s':>8} {'p50 ms':>9} "
+              f"{'p99 ms':>9} {'errors':>7} {'SLO':>8}")
+        for rate in args.rates:
+            latencies, errors, dropped, elapsed = await run_step(
+                client, workload, rate, args.duration, args.max_in_flight, args.timeout, rng
+            )
+            step = step_report(rate, args.duration, latencies, errors, dropped, elapsed,
+                               slos, args.max_error_rate)
+            steps.append(step)
+            print_step(step)
+            if not step["endpoints"]["all"]["meets_slo"] and not args.keep_going:
+                print(f"SLO violated at {rate} req/s; stopping (use --keep-going to continue)")
+                break
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Base URL of a running server; default drives the app in-process")
+    parser.add_argument("--size", type=int, default=10000, help="Catalog size to seed for in-process runs")
+    parser.add_argument("--database-url", default="sqlite:///bench_data/catalog_{size}.db",
+                        help="Database URL template for in-process runs; {size} is replaced by the catalog size")
+    parser.add_argument("--transactions-per-product", type=float, default=2.0)
+    parser.add_argument("--customers", type=int, default=100, help="Customer IDs to draw from with --url")
+    parser.add_argument("--products", type=int, default=1000, help="Catalog size for list pages with --url")
+    parser.add_argument("--mix", nargs="+", default=DEFAULT_MIX, metavar="ENDPOINT=WEIGHT",
+                        help=f"Traffic mix over {', '.join(ENDPOINTS)}")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of query, customer and page popularity")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 40, 80],
+                        help="Offered request rates (req/s), run in order")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per rate")
+    parser.add_argument("--max-in-flight", type=int, default=256,
+                        help="Outstanding requests before arrivals are dropped")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Request timeout in seconds")
+    parser.add_argument("--slo-p99-ms", type=float, default=250.0)
+    parser.add_argument("--endpoint-slo", nargs="*", default=[], metavar="ENDPOINT=MS",
+                        help="Per-endpoint p99 SLO overrides")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--keep-going", action="store_true", help="Run every rate even after the SLO is violated")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    mix = parse_pairs(args.mix, "--mix")
+    slos = {name: args.slo_p99_ms for name in mix}
+    slos.update({name: ms for name, ms in parse_pairs(args.endpoint_slo, "--endpoint-slo").items() if name in mix})
+
+    if args.url:
+        client = httpx.AsyncClient(
+            base_url=args.url,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        )
+        counts = {"products": args.products, "customers": args.customers}
+    else:
+        client, counts = in_process_client(args)
+
+    workload = Workload(mix, counts["customers"], counts["products"], args.zipf,
+                        args.page_size, random.Random(args.seed))
+    steps = asyncio.run(run(args, client, workload, slos))
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "target": args.url or "in-process",
+            "response_cache": settings.RESPONSE_CACHE_ENABLED,
+            "args": vars(args),
+        },
+        "dataset": counts,
+        "steps": steps,
+        "capacity_rps": capacity(steps),
+    }
+
+    print("Highest total offered rate at which each endpoint met its SLO:")
+    for name, rate in report["capacity_rps"].items():
+        print(f"  {name:>13}: {'none' if rate is None else f'{rate:g} req/s'}")
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
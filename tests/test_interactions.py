@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import app.db  # noqa: F401  (imports the models in dependency order)
+from app.models.transaction import Transaction
+from app.services.catalog import PRODUCT_FIELDS, CatalogSnapshot
+from app.services.interactions import InteractionStats
+from app.services.popularity import PopularityRanking
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Transaction.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def make_stats(db, ttl: float = 0) -> InteractionStats:
+    return InteractionStats(window=5, ttl=ttl, half_life=14 * 86400).ensure_loaded(db)
+
+
+def transaction(product_id: int, purchase_date: datetime, **values) -> dict:
+    return {
+        "customer_id": 1,
+        "product_id": product_id,
+        "amount_paid": 1.0,
+        "is_returned": False,
+        "rating": 5.0,
+        "purchase_date": purchase_date,
+        **values,
+    }
+
+
+def ingest(db, stats: InteractionStats, *rows: dict) -> None:
+    db.execute(insert(Transaction.__table__), list(rows))
+    stats.record(db, commit=db.commit)
+
+
+def make_snapshot(product_ids) -> CatalogSnapshot:
+    rows = [
+        SimpleNamespace(**{**dict.fromkeys(PRODUCT_FIELDS), "id": i, "category": "shoes", "tags": []})
+        for i in product_ids
+    ]
+    return CatalogSnapshot(rows, version="test")
+
+
+def test_future_purchase_date_does_not_wipe_or_overflow_decayed_counts(db):
+    stats = make_stats(db)
+    now = datetime.utcnow()
+    ingest(db, stats, transaction(1, now - timedelta(days=1)), transaction(1, now))
+    ingest(db, stats, transaction(2, datetime(2070, 1, 1)))
+
+    counts = stats.decayed_counts()
+    purchases = dict(zip(counts.product_ids.tolist(), counts.scaled(counts.purchases).tolist()))
+
+    assert counts.log_factor <= 0
+    # The far-future purchase counts as one made now
+    assert 0.99 < purchases[2] <= 1.0
+    assert 1.9 < purchases[1] < 2.0
+
+    ranking = PopularityRanking(make_snapshot([1, 2]), counts, stats.version, build=1)
+    assert ranking.top(2).tolist() == [0, 1]
+
+
+def test_decayed_counts_of_old_purchases_stay_ranked(db):
+    stats = make_stats(db)
+    long_ago = datetime.utcnow() - timedelta(days=30 * 365)
+    ingest(db, stats, transaction(1, long_ago), transaction(1, long_ago))
+    ingest(db, stats, transaction(2, long_ago))
+
+    counts = stats.decayed_counts()
+    ranking = PopularityRanking(make_snapshot([1, 2]), counts, stats.version, build=1)
+
+    assert ranking.top(2).tolist() == [0, 1]
+
+
+def test_catch_up_applies_each_new_transaction_once(db):
+    stats = make_stats(db, ttl=1e-9)
+    now = datetime.utcnow()
+    ingest(db, stats, transaction(1, now), transaction(2, now))
+
+    # Written by another process, including one committed out of id order
+    db.execute(insert(Transaction.__table__), [transaction(3, now, id=5), transaction(3, now, id=6)])
+    db.commit()
+    stats.ensure_loaded(db)
+    assert sorted(stats.gaps) == [3, 4]
+    db.execute(insert(Transaction.__table__), [transaction(4, now, id=3)])
+    db.commit()
+    stats.ensure_loaded(db)
+    stats.ensure_loaded(db)
+
+    assert stats.transactions == 5
+    assert stats.purchases == {1: 1, 2: 1, 3: 2, 4: 1}
+    assert sorted(stats.gaps) == [4]